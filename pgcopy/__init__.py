@@ -1,3 +1,5 @@
 from .version import __version__
+from .aio import AsyncCopyManager
 from .copy import CopyManager
+from .parallel import ParallelCopyManager
 from .util import Replace
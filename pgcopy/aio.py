@@ -0,0 +1,130 @@
+"binary copy from asyncio"
+
+from . import inspect, util
+from .copy import BINCOPY_HEADER, BINCOPY_TRAILER, BLOCK_SIZE, CopyManager
+
+
+def sync_only(name):
+    "method of CopyManager which is not available from asyncio"
+
+    def method(*args, **kwargs):
+        message = "{} is not supported by AsyncCopyManager".format(name)
+        raise TypeError(message)
+
+    method.__name__ = name
+    return method
+
+
+class AsyncCopyManager(CopyManager):
+    """
+    Facility for bulk-loading data using binary copy from asyncio code.
+
+    supported adaptors:
+
+    * psycopg (``psycopg.AsyncConnection``)
+    * asyncpg
+
+    :param conn: an asynchronous database connection
+
+    :param table: the table name.  Schema may be specified using dot notation: ``schema.table``.
+    :type table: str
+
+    :param cols: columns in the table into which to copy data
+    :type cols: iterable of str
+
+    The database is inspected for the column types by :meth:`compile`,
+    which is awaited on the first copy if it has not been already::
+
+        mgr = AsyncCopyManager(conn, 'measurements_table', cols)
+        await mgr.compile()
+        await mgr.copy(records)
+
+    Only :meth:`copy` is supported; the other copy methods of
+    :class:`pgcopy.CopyManager`, which block on the connection, raise
+    ``TypeError``, as do :meth:`for_tables` and :meth:`from_plan`.
+    """
+
+    is_async = True
+
+    def __init__(self, conn, table, cols):
+        self._connect(conn, table, cols)
+        self.encoder = None
+
+    async def compile(self):
+        """
+        Inspect the database for the column types.
+
+        :raises ValueError: if the table or columns do not exist.
+        """
+        if self.schema is None:
+            self.schema = await util.get_schema_async(self.backend, self.table)
+        type_dict = await inspect.get_types_async(self.backend, self.schema, self.table)
+        self.set_types(type_dict, self.backend.get_encoding())
+
+    async def copy(self, data, block_size=BLOCK_SIZE):
+        """
+        Copy data into the database.
+
+        :param data: the data to be inserted
+        :type data: iterable or async iterable of iterables
+
+        :param block_size: size in bytes of blocks sent to the database
+        :type block_size: int
+
+        Records are encoded into blocks of about ``block_size`` bytes,
+        each of which is awaited as it is written to the connection,
+        so other tasks run while the data is sent.
+
+        Returns the number of bytes copied.
+        """
+        if self.encoder is None:
+            await self.compile()
+        size = 0
+
+        async def blocks():
+            nonlocal size
+            async for block in self.encoded_blocks(data, block_size):
+                size += len(block)
+                yield block
+
+        try:
+            await self.backend.copy(self.schema, self.table, self.cols, blocks())
+        except Exception as e:
+            templ = "error doing binary copy into {0}.{1}:\n{2}"
+            e.message = templ.format(self.schema, self.table, e)
+            raise e
+        return size
+
+    threading_copy = copy
+
+    copy_chunked = sync_only("copy_chunked")
+    write_file = sync_only("write_file")
+    load_file = sync_only("load_file")
+    multiprocessing_copy = sync_only("multiprocessing_copy")
+    copy_arrays = sync_only("copy_arrays")
+    copy_dataframe = sync_only("copy_dataframe")
+    copy_arrow = sync_only("copy_arrow")
+    for_tables = classmethod(sync_only("for_tables"))
+    from_plan = classmethod(sync_only("from_plan"))
+
+    async def encoded_blocks(self, data, block_size=BLOCK_SIZE):
+        """
+        Generate blocks of at least ``block_size`` bytes of binary copy
+        data, including the header and trailer.
+        """
+        buf = bytearray(BINCOPY_HEADER)
+        encode_into = self.encoder.encode_into
+        if hasattr(data, "__aiter__"):
+            async for record in data:
+                encode_into(record, buf)
+                if len(buf) >= block_size:
+                    yield buf
+                    buf = bytearray()
+        else:
+            for record in data:
+                encode_into(record, buf)
+                if len(buf) >= block_size:
+                    yield buf
+                    buf = bytearray()
+        buf += BINCOPY_TRAILER
+        yield buf
@@ -0,0 +1,101 @@
+"Apache Arrow input for columnar copy"
+
+import codecs
+
+import numpy as np
+import pyarrow as pa
+
+from . import columnar
+
+
+def batches(data, rows_per_chunk):
+    "record batches of at most ``rows_per_chunk`` rows"
+    if isinstance(data, pa.Table):
+        data = data.to_batches(max_chunksize=rows_per_chunk)
+    elif isinstance(data, pa.RecordBatch):
+        data = [data]
+    for batch in data:
+        for start in range(0, batch.num_rows, rows_per_chunk):
+            yield batch.slice(start, rows_per_chunk)
+
+
+def unpack_bits(buf, arr):
+    bits = np.unpackbits(np.frombuffer(buf, np.uint8), bitorder="little")
+    return bits[arr.offset : arr.offset + len(arr)].astype(bool)
+
+
+def null_mask(arr):
+    "null mask from the validity bitmap"
+    buf = arr.buffers()[0]
+    if buf is None or arr.null_count == 0:
+        return np.zeros(len(arr), dtype=bool)
+    return ~unpack_bits(buf, arr)
+
+
+def fixed_values(arr, dtype, extra=0):
+    "view of the values (or offsets) buffer"
+    dtype = np.dtype(dtype)
+    buf = arr.buffers()[1]
+    offset = arr.offset * dtype.itemsize
+    return np.frombuffer(buf, dtype=dtype, count=len(arr) + extra, offset=offset)
+
+
+def binary_values(arr):
+    "view of the offsets and data buffers"
+    data = arr.buffers()[2]
+    large = pa.types.is_large_string(arr.type) or pa.types.is_large_binary(arr.type)
+    offsets = fixed_values(arr, np.int64 if large else np.int32, extra=1)
+    if data is None:
+        data = np.zeros(0, dtype=np.uint8)
+    else:
+        data = np.frombuffer(data, dtype=np.uint8)
+    return columnar.Binary(offsets, data)
+
+
+def array_values(arr, column, utf8):
+    "numpy values for one arrow array"
+    t = arr.type
+    if pa.types.is_dictionary(t):
+        return array_values(arr.dictionary_decode(), column, utf8)
+    if pa.types.is_boolean(t):
+        return unpack_bits(arr.buffers()[1], arr)
+    if pa.types.is_integer(t) or pa.types.is_floating(t):
+        return fixed_values(arr, t.to_pandas_dtype())
+    if pa.types.is_timestamp(t):
+        return fixed_values(arr, np.int64).view("datetime64[%s]" % t.unit)
+    if pa.types.is_date32(t):
+        return fixed_values(arr, np.int32).astype("datetime64[D]")
+    if pa.types.is_date64(t):
+        return fixed_values(arr, np.int64).view("datetime64[ms]")
+    if pa.types.is_time32(t) or pa.types.is_time64(t):
+        width = np.int32 if pa.types.is_time32(t) else np.int64
+        return fixed_values(arr, width).astype("timedelta64[%s]" % t.unit)
+    string = pa.types.is_string(t) or pa.types.is_large_string(t)
+    if string or pa.types.is_binary(t) or pa.types.is_large_binary(t):
+        if not column.text:
+            if column.fixed is not None and len(arr):
+                # parsed by the column's encoder, as uuid is
+                values = arr.fill_null("" if string else b"")
+                values = values.to_numpy(zero_copy_only=False)
+                return values.astype("U" if string else "S")
+        elif not string or utf8 or not column.encode_text:
+            values = binary_values(arr)
+            if column.maxsize is None or not len(arr):
+                return values
+            if values.lengths().max() <= column.maxsize:
+                return values
+    return np.fromiter(arr.to_pylist(), dtype=object, count=len(arr))
+
+
+def record_batch_blocks(row_encoder, data, cols, rows_per_chunk, block_size):
+    "generate encoded blocks from arrow record batches"
+    utf8 = codecs.lookup(row_encoder.encoding).name == "utf-8"
+    info = zip(row_encoder.atts, row_encoder.formatters)
+    columns = [columnar.Column(a, f, row_encoder.encoding) for a, f in info]
+    for batch in batches(data, rows_per_chunk):
+        arrays = [batch.column(name) for name in cols]
+        values = [array_values(a, c, utf8) for a, c in zip(arrays, columns)]
+        masks = [null_mask(a) for a in arrays]
+        encoder = columnar.ColumnarEncoder(row_encoder, values, masks)
+        for block in encoder.blocks(block_size):
+            yield block
@@ -3,27 +3,43 @@
 import codecs
 import collections
 import contextlib
+import functools
 import importlib
 import os
+import queue
+import struct
+import weakref
 
-from .errors import UnsupportedConnectionError
+from .errors import CopyAborted, UnsupportedConnectionError
 from .thread import RaisingThread
 
+# default size of reads by psycopg2 and PyGreSQL
+READ_SIZE = 8192
+
 
 def for_connection(conn):
     sources = [cls.__module__.split(".")[0] for cls in conn.__class__.mro()]
     if "psycopg2" in sources:
         return Psycopg2Backend(conn)
     if "psycopg" in sources:
+        if "AsyncConnection" in [cls.__name__ for cls in conn.__class__.mro()]:
+            return AsyncPsycopg3Backend(conn)
         return Psycopg3Backend(conn)
     if "pgdb" in sources:
         return PyGreSQLBackend(conn)
     if "pg8000" in sources:
         return Pg8000Backend(conn)
+    if "asyncpg" in sources:
+        return AsyncpgBackend(conn)
     message = f"{conn.__class__.__name__} is not a supported connection type"
     raise UnsupportedConnectionError(message)
 
 
+def read_size(fobject_factory):
+    "size of reads from files made by fobject_factory, as in pgcopy.buffers"
+    return getattr(fobject_factory, "read_size", READ_SIZE)
+
+
 def copy_sql(schema, table, columns):
     column_list = '", "'.join(columns)
     cmd = 'COPY "{0}"."{1}" ("{2}") FROM STDIN WITH BINARY'
@@ -39,6 +55,10 @@ class Psycopg2Backend:
     def get_encoding(self):
         return self.adaptor.extensions.encodings[self.conn.encoding]
 
+    def identity(self):
+        params = self.conn.get_dsn_parameters()
+        return tuple(params.get(k) for k in ("host", "port", "dbname", "user"))
+
     def namedtuple_cursor(self):
         factory = self.adaptor.extras.NamedTupleCursor
         return self.conn.cursor(cursor_factory=factory)
@@ -51,11 +71,17 @@ class Psycopg2Backend:
         sql = copy_sql(schema, table, columns)
         return Psycopg2ThreadingCopy(self.conn, sql)
 
+    def stream_copy(self, schema, table, columns, reader, size):
+        sql = copy_sql(schema, table, columns)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(sql, reader, size=size)
+
 
 class Psycopg2Copy:
     def __init__(self, conn, sql, fobject_factory):
         self.conn = conn
         self.sql = sql
+        self.read_size = read_size(fobject_factory)
         self.datastream = fobject_factory()
 
     def __enter__(self):
@@ -69,7 +95,7 @@ class Psycopg2Copy:
 
     def copystream(self):
         with self.conn.cursor() as cur:
-            cur.copy_expert(self.sql, self.datastream)
+            cur.copy_expert(self.sql, self.datastream, size=self.read_size)
 
 
 class Psycopg2ThreadingCopy:
@@ -102,6 +128,10 @@ class Psycopg3Backend:
     def get_encoding(self):
         return self.conn.info.encoding
 
+    def identity(self):
+        info = self.conn.info
+        return (info.host, info.port, info.dbname, info.user)
+
     def namedtuple_cursor(self):
         factory = self.adaptor.rows.namedtuple_row
         return self.conn.cursor(row_factory=factory)
@@ -113,12 +143,185 @@ class Psycopg3Backend:
             with cur.copy(sql) as copy:
                 yield copy
 
-    @contextlib.contextmanager
     def threading_copy(self, schema, table, columns):
+        sql = copy_sql(schema, table, columns)
+        return Psycopg3ThreadingCopy(self.conn, sql)
+
+    def stream_copy(self, schema, table, columns, reader, size):
         sql = copy_sql(schema, table, columns)
         with self.conn.cursor() as cur:
             with cur.copy(sql) as copy:
-                yield copy
+                for block in iter(functools.partial(reader.read, size), b""):
+                    copy.write(block)
+
+
+class QueueThreadingCopy:
+    """
+    Blocks written in the caller's thread are passed through a bounded
+    queue to a thread which sends them to the database, so that encoding
+    and network transfer overlap and memory use is constant.
+
+    Subclasses implement ``copystream``, consuming :meth:`blocks`.
+    """
+
+    maxsize = 4
+    ABORT = object()
+
+    def __init__(self, conn, sql):
+        self.conn = conn
+        self.sql = sql
+        self.queue = queue.Queue(self.maxsize)
+
+    def __enter__(self):
+        self.copy_thread = RaisingThread(target=self.copystream)
+        self.copy_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.put(None)
+            self.copy_thread.join()
+        else:
+            # fail the copy, but raise the caller's exception
+            self.put(self.ABORT)
+            try:
+                self.copy_thread.join()
+            except Exception:
+                pass
+
+    def write(self, data):
+        # the caller may reuse its buffer
+        self.put(bytes(data))
+
+    def put(self, block):
+        while True:
+            try:
+                return self.queue.put(block, timeout=0.1)
+            except queue.Full:
+                if not self.copy_thread.is_alive():
+                    self.copy_thread.join()
+                    raise RuntimeError("copy thread exited")
+
+    def blocks(self):
+        "generate the blocks written, in the copy thread"
+        for block in iter(self.queue.get, None):
+            if block is self.ABORT:
+                raise CopyAborted("copy aborted")
+            yield block
+
+
+class BlockReader:
+    """
+    file-like object reading from an iterator of blocks
+
+    An exception raised by the iterator is kept as :attr:`error`.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.buf = bytearray()
+        self.error = None
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buf) < size:
+            try:
+                block = next(self.blocks, None)
+            except Exception as e:
+                self.error = e
+                raise
+            if block is None:
+                break
+            self.buf += block
+        if size < 0:
+            size = len(self.buf)
+        data = bytes(self.buf[:size])
+        del self.buf[:size]
+        return data
+
+
+class Psycopg3ThreadingCopy(QueueThreadingCopy):
+    def copystream(self):
+        with self.conn.cursor() as cur:
+            with cur.copy(self.sql) as copy:
+                for block in self.blocks():
+                    copy.write(block)
+
+
+class AsyncPsycopg3Backend:
+    is_async = True
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.adaptor = importlib.import_module("psycopg")
+
+    def get_encoding(self):
+        return self.conn.info.encoding
+
+    async def fetch(self, query, params):
+        factory = self.adaptor.rows.namedtuple_row
+        async with self.conn.cursor(row_factory=factory) as cur:
+            await cur.execute(query, params)
+            return await cur.fetchall()
+
+    async def copy(self, schema, table, columns, blocks):
+        sql = copy_sql(schema, table, columns)
+        async with self.conn.cursor() as cur:
+            async with cur.copy(sql) as copy:
+                async for block in blocks:
+                    await copy.write(block)
+
+
+class AsyncpgBackend:
+    is_async = True
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def get_encoding(self):
+        return codecs.lookup(self.conn.get_settings().client_encoding).name
+
+    async def fetch(self, query, params):
+        query = query % tuple("$%d" % (i + 1) for i in range(len(params)))
+        rows = await self.conn.fetch(query, *params)
+        if not rows:
+            return []
+        rowclass = collections.namedtuple("Row", rows[0].keys())
+        return [rowclass(*row) for row in rows]
+
+    async def copy(self, schema, table, columns, blocks):
+        await self.conn.copy_to_table(
+            table,
+            source=blocks,
+            columns=columns,
+            schema_name=schema,
+            format="binary",
+        )
+
+
+identity_sql = (
+    "SELECT inet_server_addr()::text, inet_server_port(),"
+    " current_database(), current_user"
+)
+
+# identities of connections which do not keep their parameters
+identities = weakref.WeakKeyDictionary()
+
+
+def query_identity(conn):
+    "server, database and user of a connection, queried once"
+    try:
+        return identities[conn]
+    except (KeyError, TypeError):
+        pass
+    with contextlib.closing(conn.cursor()) as cur:
+        cur.execute(identity_sql)
+        identity = tuple(cur.fetchone())
+    try:
+        identities[conn] = identity
+    except TypeError:
+        # not weakly referenceable
+        pass
+    return identity
 
 
 class PyGreSQLBackend:
@@ -126,10 +329,23 @@ class PyGreSQLBackend:
         self.conn = conn
 
     def get_encoding(self):
-        with self.conn.cursor() as cur:
-            cur.execute("SHOW client_encoding")
-            row = cur.fetchone()
-            return codecs.lookup(row.client_encoding).name
+        # reported by the server to the underlying pg connection, where
+        # it is available
+        cnx = getattr(self.conn, "_cnx", None)
+        parameter = getattr(cnx, "parameter", None)
+        if parameter is not None:
+            encoding = parameter("client_encoding")
+        else:
+            with self.conn.cursor() as cur:
+                cur.execute("SHOW client_encoding")
+                encoding = cur.fetchone().client_encoding
+        return codecs.lookup(encoding).name
+
+    def identity(self):
+        cnx = getattr(self.conn, "_cnx", None)
+        if cnx is None:
+            return query_identity(self.conn)
+        return (cnx.host, cnx.port, cnx.db, cnx.user)
 
     def namedtuple_cursor(self):
         return self.conn.cursor()
@@ -137,12 +353,26 @@ class PyGreSQLBackend:
     def copy(self, schema, table, columns, fobject_factory):
         return PyGreSQLCopy(self.conn, schema, table, columns, fobject_factory)
 
+    def threading_copy(self, schema, table, columns):
+        return PyGreSQLThreadingCopy(self.conn, schema, table, columns)
+
+    def stream_copy(self, schema, table, columns, reader, size):
+        with self.conn.cursor() as cur:
+            cur.copy_from(
+                reader,
+                f"{schema}.{table}",
+                format="binary",
+                columns=columns,
+                size=size,
+            )
+
 
 class PyGreSQLCopy:
     def __init__(self, conn, schema, table, columns, fobject_factory):
         self.conn = conn
         self.table = f"{schema}.{table}"
         self.columns = columns
+        self.read_size = read_size(fobject_factory)
         self.datastream = fobject_factory()
 
     def __enter__(self):
@@ -161,36 +391,28 @@ class PyGreSQLCopy:
                 self.table,
                 format="binary",
                 columns=self.columns,
+                size=self.read_size,
             )
 
 
-class PyGreSQLThreadingCopy:
-    "but it doesn’t work"
+class PyGreSQLThreadingCopy(QueueThreadingCopy):
+    read_size = 1 << 16
 
     def __init__(self, conn, schema, table, columns):
-        self.conn = conn
+        super().__init__(conn, None)
         self.table = f"{schema}.{table}"
         self.columns = columns
-        r_fd, w_fd = os.pipe()
-        self.rstream = os.fdopen(r_fd, "rb")
-        self.wstream = os.fdopen(w_fd, "wb")
-
-    def __enter__(self):
-        self.copy_thread = RaisingThread(target=self.copystream)
-        self.copy_thread.start()
-        return self.wstream
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.wstream.close()
-        self.copy_thread.join()
 
     def copystream(self):
+        # copy_from treats an iterable as lines of text, so wrap the blocks
+        # in a file-like object; an exception from read() fails the copy
         with self.conn.cursor() as cur:
             cur.copy_from(
-                self.rstream,
+                BlockReader(self.blocks()),
                 self.table,
                 format="binary",
                 columns=self.columns,
+                size=self.read_size,
             )
 
 
@@ -201,10 +423,13 @@ class Pg8000Backend:
         self.conn = conn
 
     def get_encoding(self):
-        with contextlib.closing(self.namedtuple_cursor()) as cur:
-            cur.execute("SHOW client_encoding")
-            row = cur.fetchone()
-            return codecs.lookup(row.client_encoding).name
+        # reported by the server, so no query is needed
+        encoding = self.conn.parameter_statuses["client_encoding"]
+        return codecs.lookup(encoding).name
+
+    def identity(self):
+        # pg8000 does not keep the connection parameters
+        return query_identity(self.conn)
 
     def namedtuple_cursor(self):
         if not Pg8000Backend.NamedTupleCursor:
@@ -235,11 +460,27 @@ class Pg8000Backend:
         sql = copy_sql(schema, table, columns)
         return Pg8000Copy(self.conn, sql, fobject_factory)
 
+    def threading_copy(self, schema, table, columns):
+        sql = copy_sql(schema, table, columns)
+        return Pg8000ThreadingCopy(self.conn, sql)
+
+    def stream_copy(self, schema, table, columns, reader, size):
+        sql = copy_sql(schema, table, columns)
+        blocks = iter(functools.partial(reader.read, size), b"")
+        cur = self.conn.cursor()
+        try:
+            cur.execute(
+                sql, stream=failsafe(blocks, getattr(reader, "remainder", bytes))
+            )
+        finally:
+            cur.close()
+
 
 class Pg8000Copy:
     def __init__(self, conn, sql, fobject_factory):
         self.conn = conn
         self.sql = sql
+        self.read_size = read_size(fobject_factory)
         self.datastream = fobject_factory()
 
     def __enter__(self):
@@ -252,6 +493,32 @@ class Pg8000Copy:
         self.datastream.close()
 
     def copystream(self):
+        blocks = iter(functools.partial(self.datastream.read, self.read_size), b"")
         cur = self.conn.cursor()
-        cur.execute(self.sql, stream=self.datastream)
+        cur.execute(self.sql, stream=blocks)
         cur.close()
+
+
+class Pg8000ThreadingCopy(QueueThreadingCopy):
+    def copystream(self):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(self.sql, stream=failsafe(self.blocks()))
+        finally:
+            cur.close()
+
+
+INVALID_ROW = struct.pack(">h", -2)
+
+
+def failsafe(blocks, remainder=bytes):
+    """
+    pg8000 cannot send CopyFail, and leaves the connection unusable if
+    the stream raises, so end a failed stream with an invalid row which
+    the server rejects.  ``remainder`` returns the rest of the data up to
+    a row boundary.
+    """
+    try:
+        yield from blocks
+    except Exception:
+        yield remainder() + INVALID_ROW
@@ -0,0 +1,281 @@
+"""
+Buffer strategies for :meth:`pgcopy.CopyManager.copy`.
+
+Each strategy is an ``fobject_factory``: calling it returns a new file
+object, into which data is serialized before it is sent to the database.
+Its ``read_size`` sets the size of reads by the database adaptor, where
+the adaptor reads from a file (psycopg2, PyGreSQL and pg8000).
+"""
+
+import abc
+import importlib
+import mmap
+import os
+import tempfile
+
+from .backend import BlockReader
+
+__all__ = ["TemporaryFile", "Spooled", "Memfd", "Mmap", "Compressed"]
+
+
+class Buffer(abc.ABC):
+    "base class for buffer strategies"
+
+    read_size = 1 << 16
+
+    def __init__(self, read_size=None):
+        if read_size is not None:
+            self.read_size = read_size
+
+    @abc.abstractmethod
+    def __call__(self):
+        "a new file object"
+
+
+class TemporaryFile(Buffer):
+    """
+    Temporary file on disk.
+
+    :param read_size: size in bytes of reads by the database adaptor
+    :type read_size: int
+    """
+
+    def __call__(self):
+        return tempfile.TemporaryFile()
+
+
+class Spooled(Buffer):
+    """
+    Buffer kept in memory up to ``max_size`` bytes, which then spills
+    to a temporary file on disk.
+
+    :param max_size: maximum size in bytes kept in memory
+    :type max_size: int
+
+    :param read_size: size in bytes of reads by the database adaptor
+    :type read_size: int
+    """
+
+    def __init__(self, max_size=64 << 20, read_size=None):
+        super().__init__(read_size)
+        self.max_size = max_size
+
+    def __call__(self):
+        return tempfile.SpooledTemporaryFile(self.max_size)
+
+
+class Memfd(Buffer):
+    """
+    Anonymous in-memory file from ``memfd_create``, which has no entry in
+    any file system.  Where ``memfd_create`` is not available (it is
+    specific to Linux), a temporary file is used instead.
+
+    :param read_size: size in bytes of reads by the database adaptor
+    :type read_size: int
+    """
+
+    def __call__(self):
+        return memfd_file()
+
+
+class Mmap(Buffer):
+    """
+    Buffer written to an anonymous in-memory file (see :class:`Memfd`),
+    and read through a memory map, so that each read copies a slice of
+    the mapped data, without a system call.  Large reads are used by
+    default.
+
+    :param read_size: size in bytes of reads by the database adaptor
+    :type read_size: int
+    """
+
+    read_size = 1 << 20
+
+    def __call__(self):
+        return MmapFile(memfd_file())
+
+
+class Compressed(Buffer):
+    """
+    Temporary file on disk holding compressed data, which is decompressed
+    as it is read by the database adaptor.  Binary copy data, with its
+    length words and repeated values, typically compresses several times,
+    which saves temporary disk space and I/O.
+
+    :param codec: ``"zlib"`` or ``"lzma"`` from the standard library, or
+        ``"lz4"`` or ``"zstd"``, which require the ``lz4`` or ``zstandard``
+        packages.  By default, the first available of ``"lz4"``,
+        ``"zstd"`` and ``"zlib"``.
+    :type codec: str
+
+    :param level: compression level (default: fast compression)
+    :type level: int
+
+    :param read_size: size in bytes of reads by the database adaptor
+    :type read_size: int
+    """
+
+    def __init__(self, codec=None, level=None, read_size=None):
+        super().__init__(read_size)
+        self.codec = codec or default_codec()
+        if self.codec not in ("zlib", "lzma", "lz4", "zstd"):
+            raise ValueError("unknown codec %r" % self.codec)
+        self.level = level
+        # fail early if the codec is not installed
+        compressor(self.codec, self.level)
+
+    def __call__(self):
+        return CompressedFile(tempfile.TemporaryFile(), self.codec, self.level)
+
+
+def default_codec():
+    for codec, module in [("lz4", "lz4.frame"), ("zstd", "zstandard")]:
+        try:
+            importlib.import_module(module)
+            return codec
+        except ImportError:
+            pass
+    return "zlib"
+
+
+def compressor(codec, level):
+    if codec == "zlib":
+        import zlib
+
+        return zlib.compressobj(1 if level is None else level)
+    if codec == "lzma":
+        import lzma
+
+        return lzma.LZMACompressor(preset=0 if level is None else level)
+    if codec == "lz4":
+        return LZ4Compressor(0 if level is None else level)
+    import zstandard
+
+    return zstandard.ZstdCompressor(1 if level is None else level).compressobj()
+
+
+def decompressor(codec):
+    if codec == "zlib":
+        import zlib
+
+        return zlib.decompressobj()
+    if codec == "lzma":
+        import lzma
+
+        return lzma.LZMADecompressor()
+    if codec == "lz4":
+        import lz4.frame
+
+        return lz4.frame.LZ4FrameDecompressor()
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+class LZ4Compressor(object):
+    "lz4 frame compressor with the interface of zlib compression objects"
+
+    def __init__(self, level):
+        import lz4.frame
+
+        self.compressor = lz4.frame.LZ4FrameCompressor(compression_level=level)
+        self.header = self.compressor.begin()
+
+    def compress(self, data):
+        header, self.header = self.header, b""
+        return header + self.compressor.compress(data)
+
+    def flush(self):
+        return self.header + self.compressor.flush()
+
+
+class CompressedFile(object):
+    """
+    File object which compresses data written to ``fileobj``, and
+    decompresses it as it is read once rewound.
+    """
+
+    chunk_size = 1 << 16
+
+    def __init__(self, fileobj, codec, level):
+        self.file = fileobj
+        self.codec = codec
+        self.compressor = compressor(codec, level)
+        self.reader = None
+
+    def write(self, data):
+        self.file.write(self.compressor.compress(data))
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if offset != 0 or whence != os.SEEK_SET:
+            raise ValueError("only rewinding is supported")
+        if self.compressor is not None:
+            self.file.write(self.compressor.flush())
+            self.compressor = None
+        self.file.seek(0)
+        self.reader = BlockReader(self.blocks())
+        return 0
+
+    def blocks(self):
+        decompress = decompressor(self.codec).decompress
+        for chunk in iter(lambda: self.file.read(self.chunk_size), b""):
+            yield decompress(chunk)
+
+    def read(self, size=-1):
+        if self.reader is None:
+            raise ValueError("file is being written")
+        return self.reader.read(size)
+
+    def close(self):
+        self.file.close()
+
+
+def memfd_file():
+    try:
+        fd = os.memfd_create("pgcopy", os.MFD_CLOEXEC)
+    except (AttributeError, OSError):
+        return tempfile.TemporaryFile()
+    return open(fd, "w+b")
+
+
+class MmapFile(object):
+    """
+    File object which is written to ``fileobj``, and read through a memory
+    map of the data written when it is rewound.  Reads return ``bytes``,
+    as the database adaptors require, so the data is copied once.
+    """
+
+    def __init__(self, fileobj):
+        self.file = fileobj
+        self.map = None
+        self.pos = 0
+
+    def write(self, data):
+        return self.file.write(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence != os.SEEK_SET:
+            raise ValueError("only absolute positions are supported")
+        if self.map is None:
+            self.file.flush()
+            size = self.file.seek(0, os.SEEK_END)
+            if size:
+                self.map = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        self.pos = offset
+        return offset
+
+    def read(self, size=-1):
+        if self.map is None:
+            return b""
+        end = len(self.map)
+        if 0 <= size < end - self.pos:
+            end = self.pos + size
+        data = self.map[self.pos : end]
+        self.pos = end
+        return data
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
@@ -0,0 +1,99 @@
+"process-wide cache of copy plans"
+
+import collections
+import threading
+import time
+
+PlanKey = collections.namedtuple(
+    "PlanKey", "manager_class server schema table columns encoding"
+)
+Plan = collections.namedtuple("Plan", "schema encoder ddl_stamp created")
+
+
+class PlanCache(object):
+    """
+    Cache of the catalog information and row encoders of copy managers,
+    shared by all connections to the same server and database.
+
+    To use it, set it as the ``plan_cache`` of a copy manager class::
+
+        class CachedCopyManager(CopyManager):
+            plan_cache = PlanCache(maxsize=256, ttl=600)
+
+    Then only the first manager for a table and columns queries the
+    catalog; others use the cached plan, without any query.
+
+    :param maxsize: maximum number of plans, least recently used first out
+    :type maxsize: int
+
+    :param ttl: seconds after which a plan is reloaded
+    :type ttl: float
+
+    :param check_ddl: check on each use, with one query of ``pg_class``,
+        that the table has not been altered, dropped or re-created
+    :type check_ddl: bool
+
+    Tables given without a schema take one query to find their schema,
+    as found by the connection's ``search_path``, and plans are cached
+    under that schema.  Temporary tables are created anew by each
+    session, possibly in a schema used by an earlier session, so their
+    plans are only safe with ``check_ddl``.  Call :meth:`invalidate`
+    after altering a table.
+    """
+
+    def __init__(self, maxsize=128, ttl=None, check_ddl=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_ddl = check_ddl
+        self.plans = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.plans)
+
+    def get(self, key):
+        "cached plan, or None"
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None and self.expired(plan):
+                del self.plans[key]
+                plan = None
+            if plan is None:
+                self.misses += 1
+                return None
+            self.plans.move_to_end(key)
+            self.hits += 1
+            return plan
+
+    def put(self, key, schema, encoder, ddl_stamp=None):
+        with self.lock:
+            self.plans[key] = Plan(schema, encoder, ddl_stamp, time.monotonic())
+            self.plans.move_to_end(key)
+            while len(self.plans) > self.maxsize:
+                self.plans.popitem(last=False)
+
+    def expired(self, plan):
+        return self.ttl is not None and time.monotonic() - plan.created > self.ttl
+
+    def invalidate(self, table=None, schema=None):
+        """
+        Remove plans for a table, for all tables in a schema, or all plans.
+
+        :param table: table name
+        :type table: str
+
+        :param schema: schema name
+        :type schema: str
+        """
+        with self.lock:
+            for key, plan in list(self.plans.items()):
+                if table is not None and key.table != table:
+                    continue
+                if schema is not None and plan.schema != schema:
+                    continue
+                del self.plans[key]
+
+    def clear(self):
+        self.invalidate()
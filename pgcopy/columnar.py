@@ -0,0 +1,427 @@
+"vectorized binary encoding of columnar data with numpy"
+
+import struct
+
+import numpy as np
+
+from . import errors
+from .copy import uuid_value
+
+psql_epoch_date = np.datetime64("2000-01-01", "D")
+psql_epoch = np.datetime64("2000-01-01T00:00:00", "us")
+
+
+def integer(dtype):
+    info = np.iinfo(dtype)
+
+    def f(values):
+        values = cast(values, dtype)
+        if values.size and values.dtype.kind in "iu":
+            if values.min() < info.min or values.max() > info.max:
+                raise ValueError("value out of range for {}".format(dtype))
+        return values.astype(dtype)
+
+    return f
+
+
+def floating(dtype):
+    return lambda values: cast(values, dtype).astype(dtype)
+
+
+def cast(values, dtype):
+    if not np.can_cast(values.dtype, dtype, casting="same_kind"):
+        message = "cannot encode {} values as {}"
+        raise TypeError(message.format(values.dtype, np.dtype(dtype)))
+    return values
+
+
+def boolean(values):
+    return cast(values, "?").astype("?")
+
+
+def check_kind(values, kind, type_name):
+    if values.dtype.kind != kind:
+        message = "cannot encode {} values as {}"
+        raise TypeError(message.format(values.dtype, type_name))
+    return values
+
+
+def datestamp(values):
+    "days since 2000-01-01"
+    days = check_kind(values, "M", "date").astype("datetime64[D]") - psql_epoch_date
+    return days.astype(">i4")
+
+
+def timestamp(values):
+    "microseconds since 2000-01-01 00:00"
+    usecs = check_kind(values, "M", "timestamp").astype("datetime64[us]") - psql_epoch
+    return usecs.astype(">i8")
+
+
+def time(values):
+    "microseconds since midnight"
+    usecs = check_kind(values, "m", "time").astype("timedelta64[us]")
+    return usecs.astype(">i8")
+
+
+# value of each ascii hex digit, and 0xFF for every other character
+hex_values = np.full(256, 0xFF, dtype=np.uint8)
+hex_values[list(b"0123456789abcdef")] = np.arange(16)
+hex_values[list(b"0123456789ABCDEF")] = np.arange(16)
+
+
+def uuid(values):
+    "16 bytes of each UUID, given as hex strings or as 16 bytes"
+    kind = values.dtype.kind
+    if kind not in "SU":
+        message = "cannot encode {} values as uuid"
+        raise TypeError(message.format(values.dtype))
+    if kind == "S" and values.itemsize == 16:
+        return values
+    char = np.dtype(np.uint8 if kind == "S" else np.uint32)
+    chars = np.ascontiguousarray(values).view(char)
+    chars = chars.reshape(len(values), values.itemsize // char.itemsize)
+    if chars.shape[1] == 36 and (chars[:, [8, 13, 18, 23]] == ord("-")).all():
+        chars = np.delete(chars, [8, 13, 18, 23], axis=1)
+    if chars.shape[1] == 32:
+        digits = hex_values[np.minimum(chars, 0xFF)]
+        if not (digits == 0xFF).any():
+            data = digits[:, 0::2] << 4 | digits[:, 1::2]
+            return np.ascontiguousarray(data).view("S16").ravel()
+    # braces, urns, strings of different forms or errors
+    data = b"".join(uuid_value(v) for v in values.tolist())
+    return np.frombuffer(data, "S16")
+
+
+column_encoders = {
+    "bool": boolean,
+    "int2": integer(">i2"),
+    "int4": integer(">i4"),
+    "int8": integer(">i8"),
+    "float4": floating(">f4"),
+    "float8": floating(">f8"),
+    "date": datestamp,
+    "time": time,
+    "timestamp": timestamp,
+    "timestamptz": timestamp,
+    "uuid": uuid,
+}
+
+text_types = ("varchar", "bpchar", "bytea", "text", "json")
+
+
+class Binary(object):
+    """
+    Variable-length values stored as offsets into one buffer of
+    concatenated bytes, as in Apache Arrow binary and string arrays.
+    """
+
+    ndim = 1
+    dtype = np.dtype("V")
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, _ = key.indices(len(self))
+            return Binary(self.offsets[start : stop + 1], self.data)
+        lengths = self.lengths()
+        if not lengths[~key].any():
+            # dropped values are empty, so the data can be shared
+            return Binary(
+                np.append(self.offsets[:-1][key], self.offsets[-1]), self.data
+            )
+        data = self.blob()[np.repeat(key, lengths)]
+        lengths = lengths[key]
+        return Binary(np.append(0, np.cumsum(lengths)), data)
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def blob(self):
+        return self.data[self.offsets[0] : self.offsets[-1]]
+
+
+def null_mask(values, mask):
+    "combine explicit mask with masked-array mask, None and NaT"
+    masks = [np.zeros(len(values), dtype=bool)]
+    if np.ma.isMaskedArray(values):
+        # rows of 2-dimensional arrays are null where entirely masked
+        masked = np.ma.getmaskarray(values)
+        masks.append(masked.reshape(len(values), -1).all(axis=1))
+    if mask is not None:
+        masks.append(np.asarray(mask, dtype=bool))
+    data = getdata(values)
+    if data.dtype.kind in "mM":
+        masks.append(np.isnat(data))
+    elif data.dtype.kind == "O":
+        masks.append(np.fromiter((v is None for v in data), bool, len(data)))
+    return np.logical_or.reduce(masks)
+
+
+def getdata(values):
+    if np.ma.isMaskedArray(values):
+        return np.ma.getdata(values)
+    return values
+
+
+class Column(object):
+    """
+    Conversion of one column's values to fixed-width big-endian values
+    or to variable-length byte strings.
+    """
+
+    def __init__(self, att, formatter, encoding, base_formatter=None):
+        self.att = att
+        self.formatter = formatter
+        self.encoding = encoding
+        self.fixed = None
+        self.ndim = 1
+        encode_column = getattr(base_formatter, "encode_column", None)
+        if encode_column is not None:
+            # each value is a row of a 2-dimensional array
+            self.fixed = encode_column
+            self.ndim = 2
+        elif att.type_category != "A":
+            self.fixed = column_encoders.get(att.type_name)
+        self.text = att.type_name in text_types or att.type_category == "E"
+        self.maxsize = None
+        if att.type_name in ("varchar", "bpchar") and att.type_mod >= 0:
+            # postgres reports size + 4
+            self.maxsize = att.type_mod - 4
+        encoded = att.type_name in ("varchar", "text", "json")
+        self.encode_text = encoded or att.type_category == "E"
+
+    def is_fixed(self, values):
+        return self.fixed is not None and values.dtype.kind not in "OV"
+
+    def check(self, values):
+        "raise an error early if values cannot be encoded"
+        if isinstance(values, Binary) and not self.text:
+            message = "type {} is not supported for binary values"
+            raise TypeError(message.format(self.att.type_name))
+        if self.is_fixed(values):
+            self.convert(values[:0])
+        elif self.fixed is None and values.dtype.kind != "O" and not self.text:
+            message = "type {} is not supported for {} values"
+            raise TypeError(message.format(self.att.type_name, values.dtype))
+
+    def convert(self, values):
+        "fixed-width values array, or (lengths, blob) for non-null values"
+        try:
+            if self.is_fixed(values):
+                return self.fixed(values)
+            if isinstance(values, Binary):
+                return values.lengths(), values.blob()
+            if values.dtype.kind in "SU":
+                return self.convert_strings(values)
+            return self.convert_objects(values)
+        except Exception as exc:
+            message = "error formatting values for column {}"
+            errors.raise_from(ValueError, message.format(self.att.attname), exc)
+
+    def convert_strings(self, values):
+        if self.maxsize is not None and values.itemsize > self.maxsize:
+            values = values.astype((values.dtype.kind, self.maxsize))
+        if values.dtype.kind == "U":
+            if not self.encode_text:
+                raise TypeError("{} requires bytes".format(self.att.type_name))
+            values = np.char.encode(values, self.encoding)
+        width = values.itemsize
+        lengths = np.char.str_len(values)
+        chars = values.view(np.uint8).reshape(len(values), width)
+        blob = chars[np.arange(width) < lengths[:, None]]
+        return lengths, blob
+
+    def convert_objects(self, values):
+        if self.text:
+            encoded = [self.encode_object(v) for v in values]
+        else:
+            encoded = [self.format_object(v) for v in values]
+        lengths = np.fromiter(map(len, encoded), np.int64, len(encoded))
+        blob = np.frombuffer(b"".join(encoded), np.uint8)
+        return lengths, blob
+
+    def encode_object(self, v):
+        if self.maxsize is not None:
+            v = v[: self.maxsize]
+        if self.encode_text and v.__class__ is str:
+            v = v.encode(self.encoding)
+        if not isinstance(v, bytes):
+            v = bytes(memoryview(v))
+        return v
+
+    def format_object(self, v):
+        f, d = self.formatter(v)
+        return struct.pack(">" + f, *d)[4:]
+
+
+class ColumnarEncoder(object):
+    """
+    Encode one array per column into binary copy tuples.
+
+    Fixed-width columns are converted to big-endian values and
+    interleaved with their length words in a numpy structured array.
+    If there are variable-length columns, each value's bytes are
+    scattered to their place in the output with fancy indexing.
+    Either way, rows are never visited individually in python.
+    Null values are given by ``masks`` (true where null), by numpy
+    masked arrays, by ``NaT``, or by ``None`` in object arrays.
+    Columns are converted one block at a time, so memory use is
+    bounded by the block size.
+    """
+
+    def __init__(self, row_encoder, columns, masks=None):
+        atts = row_encoder.atts
+        if len(columns) != len(atts):
+            message = "expected {} columns, got {}"
+            raise ValueError(message.format(len(atts), len(columns)))
+        if masks is None:
+            masks = [None] * len(columns)
+        formats = zip(atts, row_encoder.formatters, row_encoder.base_formatters)
+        self.columns = [Column(a, f, row_encoder.encoding, b) for a, f, b in formats]
+        self.values = []
+        self.masks = masks
+        self.length = None
+        for column, values in zip(self.columns, columns):
+            if not (np.ma.isMaskedArray(values) or isinstance(values, Binary)):
+                values = np.asarray(values)
+            if values.ndim not in (1, column.ndim):
+                message = "column {} is not 1-dimensional"
+                raise ValueError(message.format(column.att.attname))
+            if self.length is None:
+                self.length = len(values)
+            elif len(values) != self.length:
+                raise ValueError("columns must all have the same length")
+            column.check(getdata(values))
+            self.values.append(values)
+
+    def __len__(self):
+        return self.length or 0
+
+    def chunk(self, start, stop):
+        for column, values, mask in zip(self.columns, self.values, self.masks):
+            values = values[start:stop]
+            mask = null_mask(values, None if mask is None else mask[start:stop])
+            if column.att.not_null and mask.any():
+                message = 'null value in column "{}" not allowed'
+                raise ValueError(message.format(column.att.attname))
+            data = getdata(values)
+            if column.is_fixed(data):
+                if data.dtype.kind in "iu" and mask.any():
+                    # don't range check whatever is under the mask
+                    data = np.where(mask, data.dtype.type(0), data)
+                elif data.dtype.kind in "SU" and mask.any():
+                    # nor parse it
+                    values = column.convert(data[~mask])
+                    data = np.zeros(len(data), values.dtype)
+                    data[~mask] = values
+                    yield mask, data
+                    continue
+                yield mask, column.convert(data)
+            else:
+                yield mask, column.convert(data[~mask])
+
+    def encode(self, start, stop):
+        "encode rows [start, stop) as bytes"
+        chunk = list(self.chunk(start, stop))
+        if all(not isinstance(data, tuple) for _, data in chunk):
+            return self.encode_fixed(stop - start, chunk)
+        return self.encode_scatter(stop - start, chunk)
+
+    def encode_fixed(self, count, chunk):
+        fields = [("count", ">i2")]
+        for i, (_, values) in enumerate(chunk):
+            fields += [("l%d" % i, ">i4"), ("v%d" % i, values.dtype)]
+        dtype = np.dtype(fields)
+        rows = np.empty(count, dtype=dtype)
+        rows["count"] = len(chunk)
+        keep = None
+        for i, (mask, values) in enumerate(chunk):
+            rows["l%d" % i] = values.dtype.itemsize
+            rows["v%d" % i] = values
+            if not mask.any():
+                continue
+            rows["l%d" % i][mask] = -1
+            if keep is None:
+                keep = np.ones((count, dtype.itemsize), dtype=bool)
+            offset = dtype.fields["v%d" % i][1]
+            keep[:, offset : offset + values.dtype.itemsize] = ~mask[:, None]
+        if keep is None:
+            return rows.tobytes()
+        return rows.view(np.uint8).reshape(count, dtype.itemsize)[keep].tobytes()
+
+    def encode_scatter(self, count, chunk):
+        sizes = np.empty((count, len(chunk)), dtype=np.int64)
+        for i, (mask, data) in enumerate(chunk):
+            if isinstance(data, tuple):
+                sizes[~mask, i] = data[0]
+            else:
+                sizes[:, i] = data.dtype.itemsize
+            sizes[mask, i] = -1
+        widths = 4 + np.maximum(sizes, 0)
+        row_widths = 2 + widths.sum(axis=1)
+        row_starts = np.cumsum(row_widths) - row_widths
+        out = np.empty(int(row_widths.sum()), dtype=np.uint8)
+        header = np.array([len(chunk)], dtype=">i2").view(np.uint8)
+        out[row_starts[:, None] + np.arange(2)] = header
+        cell_starts = row_starts[:, None] + 2 + np.cumsum(widths, axis=1) - widths
+        words = sizes.astype(">i4").view(np.uint8).reshape(count, len(chunk), 4)
+        out[cell_starts[:, :, None] + np.arange(4)] = words
+        for i, (mask, data) in enumerate(chunk):
+            starts = cell_starts[~mask, i] + 4
+            if isinstance(data, tuple):
+                lengths, blob = data
+                offsets = np.cumsum(lengths) - lengths
+                index = np.repeat(starts - offsets, lengths)
+                out[index + np.arange(len(blob))] = blob
+            else:
+                size = data.dtype.itemsize
+                values = data.view(np.uint8).reshape(count, size)[~mask]
+                out[starts[:, None] + np.arange(size)] = values
+        return out.tobytes()
+
+    def blocks(self, block_size):
+        "generate encoded blocks of approximately ``block_size`` bytes"
+        row_size = 2 + sum(4 + 8 * width(values) for values in self.values)
+        start = 0
+        while start < len(self):
+            stop = min(start + max(1, block_size // row_size), len(self))
+            block = self.encode(start, stop)
+            row_size = max(1, len(block) // (stop - start))
+            start = stop
+            yield block
+
+
+def width(values):
+    "number of values in each row"
+    if values.ndim == 1:
+        return 1
+    return int(np.prod(values.shape[1:]))
+
+
+def series_values(series):
+    "numpy values and null mask of a pandas Series"
+    mask = series.isna().to_numpy()
+    dtype = series.dtype
+    if getattr(dtype, "tz", None) is not None:
+        series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+    numpy_dtype = getattr(dtype, "numpy_dtype", None)
+    if numpy_dtype is not None and numpy_dtype.kind in "biuf":
+        return series.to_numpy(dtype=numpy_dtype, na_value=0), mask
+    return series.to_numpy(), mask
+
+
+def dataframe_blocks(row_encoder, df, rows_per_chunk, block_size):
+    "generate encoded blocks from a pandas DataFrame, one row group at a time"
+    for start in range(0, len(df), rows_per_chunk):
+        group = df.iloc[start : start + rows_per_chunk]
+        columns, masks = zip(*(series_values(group[c]) for c in group.columns))
+        encoder = ColumnarEncoder(row_encoder, columns, masks)
+        for block in encoder.blocks(block_size):
+            yield block
@@ -3,19 +3,137 @@ import struct
 from .. import copy, util
 
 
-def vector_formatter(val):
+def check_1d(val):
     info = util.array_info(val)
-    ndim, lengths = info[0], info[1:]
-    if ndim != 1:
+    if info[0] != 1:
         raise ValueError("{} is not a 1D array type".format(val))
 
-    # https://github.com/pgvector/pgvector/blob/587e9ba97c1cb057117bc9b081c0170b5013f8d8/src/vector.c#L402-L419
-    fmt = ">hh" + "f" * lengths[0]
-    data = [lengths[0], 0, *val]
 
-    return copy.str_formatter(struct.pack(fmt, *data))
+def to_numpy(val):
+    # pgvector's Vector, HalfVector and Bit objects
+    if not copy.is_ndarray(val) and hasattr(val, "to_numpy"):
+        return val.to_numpy()
+    return val
+
+
+class VectorFormatter(object):
+    """
+    Formatter of ``vector`` values, or of ``halfvec`` values with
+    ``code="e"``, given as lists or tuples of floats, as 1-dimensional
+    numpy arrays, or as pgvector ``Vector`` objects.
+
+    numpy arrays are converted to big-endian floats as a whole, and
+    :meth:`encode_column` converts a 2-dimensional array of one vector
+    per row for :meth:`pgcopy.CopyManager.copy_arrays`.
+    """
+
+    def __init__(self, code="f"):
+        self.code = code
+        self.dtype = ">f%d" % struct.calcsize(code)
+
+    def __call__(self, val):
+        val = to_numpy(val)
+        if copy.is_ndarray(val):
+            if val.ndim != 1:
+                raise ValueError("{} is not a 1D array type".format(val))
+            dim = len(val)
+            data = val.astype(self.dtype, copy=False).tobytes()
+        else:
+            if val.__class__ not in (list, tuple):
+                check_1d(val)
+            dim = len(val)
+            try:
+                data = struct.pack(">%d%s" % (dim, self.code), *val)
+            except struct.error:
+                check_1d(val)
+                raise
+        # https://github.com/pgvector/pgvector/blob/587e9ba97c1cb057117bc9b081c0170b5013f8d8/src/vector.c#L402-L419
+        return "ihh%ds" % len(data), (4 + len(data), dim, 0, data)
+
+    def encode_column(self, values):
+        "one vector per row of a 2-dimensional array, as fixed-width records"
+        import numpy as np
+
+        if values.ndim != 2:
+            raise ValueError("vectors must be given as a 2-dimensional array")
+        count, dim = values.shape
+        fields = [("dim", ">i2"), ("unused", ">i2"), ("x", self.dtype, (dim,))]
+        records = np.empty(count, dtype=fields)
+        records["dim"] = dim
+        records["unused"] = 0
+        records["x"] = values
+        return records
+
+
+vector_formatter = VectorFormatter("f")
+halfvec_formatter = VectorFormatter("e")
+
+
+def sparsevec_formatter(val):
+    """
+    sparsevec values given as pgvector ``SparseVector`` objects, or as
+    dense lists, tuples or numpy arrays, of which the non-zero elements
+    are kept
+    """
+    if hasattr(val, "indices"):
+        dim = val.dimensions()
+        elems = sorted(zip(val.indices(), val.values()))
+        elems = [(i, v) for i, v in elems if v]
+    elif copy.is_ndarray(val):
+        if val.ndim != 1:
+            raise ValueError("{} is not a 1D array type".format(val))
+        import numpy as np
+
+        dim = len(val)
+        indices = np.flatnonzero(val)
+        elems = zip(indices.tolist(), val[indices].tolist())
+    else:
+        check_1d(val)
+        dim = len(val)
+        elems = [(i, v) for i, v in enumerate(val) if v]
+    indices, values = tuple(zip(*elems)) or ((), ())
+    nnz = len(indices)
+    # dimensions, number of non-zero elements, unused,
+    # then zero-based indices and values
+    fmt = "3i%di%df" % (nnz, nnz)
+    return "i" + fmt, (12 + 8 * nnz, dim, nnz, 0) + indices + values
+
+
+def bit_formatter(val):
+    """
+    bit and varbit values given as strings of ``0`` and ``1``, as
+    sequences or numpy arrays of booleans, or as bytes of 8 bits each
+    """
+    val = to_numpy(val)
+    if isinstance(val, str):
+        size = len(val)
+        if val.strip("01"):
+            raise ValueError("{!r} is not a bit string".format(val))
+        bits = int(val or "0", 2) << (-size % 8)
+        data = bits.to_bytes((size + 7) // 8, "big")
+    elif isinstance(val, (bytes, bytearray)):
+        size = 8 * len(val)
+        data = bytes(val)
+    elif copy.is_ndarray(val):
+        import numpy as np
+
+        if val.ndim != 1:
+            raise ValueError("{} is not a 1D array type".format(val))
+        size = len(val)
+        data = np.packbits(val.astype(bool, copy=False)).tobytes()
+    else:
+        return bit_formatter("".join("1" if b else "0" for b in val))
+    # number of bits, then the bits, high bit first
+    return "ii%ds" % len(data), (4 + len(data), size, data)
 
 
 class CopyManager(copy.CopyManager):
-    "Add support for vector"
-    type_formatters = {"vector": vector_formatter}
+    "Add support for the pgvector types vector, halfvec and sparsevec, and bit"
+
+    type_formatters = {
+        "vector": vector_formatter,
+        "halfvec": halfvec_formatter,
+        "sparsevec": sparsevec_formatter,
+        "bit": bit_formatter,
+        "varbit": bit_formatter,
+    }
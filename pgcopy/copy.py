@@ -1,17 +1,24 @@
-import calendar
+import collections
 import functools
+import itertools
+import numbers
 import os
 import struct
+import sys
 import tempfile
 import uuid
-from datetime import date, datetime
+from datetime import date, time, timezone
+from decimal import Decimal
+
+import pytz.tzinfo
 
 try:
     from itertools import izip as zip
 except ImportError:
     pass
 
-from . import backend, errors, inspect, util
+from . import backend, buffers, errors, inspect, util
+from .cache import PlanKey
 from .thread import RaisingThread
 
 __all__ = ["CopyManager"]
@@ -19,12 +26,48 @@ __all__ = ["CopyManager"]
 BINCOPY_HEADER = struct.pack(">11sii", b"PGCOPY\n\377\r\n\0", 0, 0)
 BINCOPY_TRAILER = struct.pack(">h", -1)
 
-MAX_INT64 = 0xFFFFFFFFFFFFFFFF
+BLOCK_SIZE = 1 << 20
+
+# size in bytes of bytea and text values which are not copied into the
+# buffers of encoded data, but written out as they are
+LARGE_VALUE_SIZE = 1 << 16
+
+Checkpoint = collections.namedtuple("Checkpoint", "rows offset")
 
 
 def simple_formatter(fmt):
     size = struct.calcsize(">" + fmt)
-    return lambda val: ("i" + fmt, (size, val))
+    return functools.partial(_simple_format, "i" + fmt, size)
+
+
+def _simple_format(fmt, size, val):
+    return (fmt, (size, val))
+
+
+def converted_formatter(fmt, convert):
+    "fixed-width formatter of values converted by ``convert``"
+    size = struct.calcsize(">" + fmt)
+    return functools.partial(_converted_format, "i" + fmt, size, convert)
+
+
+def _converted_format(fmt, size, convert, val):
+    return (fmt, (size, convert(val)))
+
+
+def fixed_format(formatter):
+    "struct format and size of a fixed-width formatter, otherwise None"
+    if isinstance(formatter, functools.partial):
+        if formatter.func in (_simple_format, _converted_format):
+            return formatter.args[:2]
+    return None
+
+
+def converter(formatter):
+    "value conversion of a fixed-width formatter, otherwise None"
+    if isinstance(formatter, functools.partial):
+        if formatter.func is _converted_format:
+            return formatter.args[2]
+    return None
 
 
 def str_formatter(val):
@@ -32,76 +75,275 @@ def str_formatter(val):
     return ("i%ss" % size, (size, val))
 
 
+def bytea_formatter(val):
+    if not isinstance(val, (bytes, bytearray)):
+        val = bytea_buffer(val).tobytes()
+    return str_formatter(val)
+
+
+def bytea_value(val, threshold=0):
+    """
+    Object and size in bytes of a bytea value given as a bytes-like
+    object, or as a binary file-like object positioned at its start.
+    Bytes-like values are returned as byte memoryviews, and file-like
+    values smaller than ``threshold`` are read.
+    """
+    if hasattr(val, "read"):
+        start = val.tell()
+        size = val.seek(0, os.SEEK_END) - start
+        val.seek(start)
+        if size < threshold:
+            val = memoryview(peek(val, size))
+        return val, size
+    view = memoryview(val)
+    if view.c_contiguous:
+        view = view.cast("B")
+    else:
+        view = memoryview(view.tobytes())
+    return view, view.nbytes
+
+
+def bytea_buffer(val):
+    "bytes-like object with the data of a bytea value"
+    val, size = bytea_value(val)
+    if hasattr(val, "read"):
+        return memoryview(peek(val, size))
+    return val
+
+
+def peek(fileobj, size):
+    """
+    Read ``size`` bytes and seek back, so that the value can be read
+    again if its record falls back to being encoded by ``encode_slow``.
+    """
+    start = fileobj.tell()
+    try:
+        return read_exactly(fileobj, size)
+    finally:
+        fileobj.seek(start)
+
+
+def read_exactly(fileobj, size):
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise ValueError("file ended after %d of %d bytes" % (len(data), size))
+    return data
+
+
+def write_value(stream, value, size):
+    "write a bytes-like or file-like value to a file-like object"
+    if not hasattr(value, "read"):
+        stream.write(value)
+        return
+    while size:
+        stream.write(read_exactly(value, min(size, BLOCK_SIZE)))
+        size -= min(size, BLOCK_SIZE)
+
+
 psql_epoch = 946684800
 psql_epoch_date = date(2000, 1, 1)
+psql_epoch_ordinal = psql_epoch_date.toordinal()
+
+DAY_USECS = 86400 * 1000000
 
+# offsets in microseconds of time zones whose offset does not depend on
+# the date: datetime.timezone, and pytz time zones, which are attached
+# to datetimes for one offset by localize() or normalize()
+tz_offsets = {}
+fixed_tz_types = (timezone, pytz.tzinfo.BaseTzInfo)
+utc_zones = (None, pytz.UTC, timezone.utc)
 
-def timestamp(dt):
-    "get microseconds since 2000-01-01 00:00"
-    # see http://stackoverflow.com/questions/2956886/
-    dt = util.to_utc(dt)
-    unix_timestamp = calendar.timegm(dt.timetuple())
-    # timetuple doesn't maintain microseconds
-    # see http://stackoverflow.com/a/14369386/519015
-    val = ((unix_timestamp - psql_epoch) * 1000000) + dt.microsecond
-    return ("iq", (8, val))
+
+def tz_offset(dt, tzinfo):
+    "offset from UTC of an aware datetime, in microseconds"
+    try:
+        return tz_offsets[tzinfo]
+    except (KeyError, TypeError):
+        pass
+    offset = dt.utcoffset()
+    offset = (offset.days * 86400 + offset.seconds) * 1000000 + offset.microseconds
+    if isinstance(tzinfo, fixed_tz_types):
+        if len(tz_offsets) >= 1024:
+            tz_offsets.clear()
+        tz_offsets[tzinfo] = offset
+    return offset
+
+
+def timestamp_value(dt):
+    "microseconds since 2000-01-01 00:00 UTC; naive datetimes are UTC"
+    days = dt.toordinal() - psql_epoch_ordinal
+    try:
+        tzinfo = dt.tzinfo
+    except AttributeError:
+        # date
+        return days * DAY_USECS
+    usecs = (
+        ((days * 24 + dt.hour) * 60 + dt.minute) * 60 + dt.second
+    ) * 1000000 + dt.microsecond
+    if tzinfo in utc_zones:
+        return usecs
+    return usecs - tz_offset(dt, tzinfo)
 
 
-def time_formatter(t):
-    "get microseconds since 2000-01-01 00:00"
-    t = util.to_utc_time(t)
-    dt = datetime.combine(psql_epoch_date, t)
-    return timestamp(dt)
+def time_value(t):
+    "microseconds since 00:00"
+    if isinstance(t, time) and t.tzinfo is not None:
+        raise ValueError("time {} has a time zone".format(t))
+    return ((t.hour * 60 + t.minute) * 60 + t.second) * 1000000 + t.microsecond
 
 
-def datestamp(d):
+def date_value(d):
     "days since 2000-01-01"
-    return ("ii", (4, (d - psql_epoch_date).days))
+    return d.toordinal() - psql_epoch_ordinal
+
+
+timestamp = converted_formatter("q", timestamp_value)
+time_formatter = converted_formatter("q", time_value)
+datestamp = converted_formatter("i", date_value)
 
 
-def numeric(n):
+NUMERIC_NAN = ("ihhHH", (8, 0, 0, 0xC000, 0))
+NUMERIC_FORMATS = ["ihhHH%dH" % i for i in range(32)]
+POW10 = [10**i for i in range(4)]
+
+
+def decimal_parts(text, e="E"):
+    "coefficient and exponent of a decimal number as text"
+    mantissa, _, exponent = text.partition(e)
+    whole, _, fraction = mantissa.partition(".")
+    return int(whole + fraction), int(exponent or 0) - len(fraction)
+
+
+def numeric(n, scale=None):
     """
-    NBASE = 1000
+    NBASE = 10000
     ndigits = total number of base-NBASE digits
     weight = base-NBASE weight of first digit
     sign = 0x0000 if positive, 0x4000 if negative, 0xC000 if nan
     dscale = decimal digits after decimal place
+
+    Accepts Decimal, int and float values.  Floats are converted by
+    their shortest representation, as shown by ``repr``.  Given a
+    ``scale``, values are rounded half away from zero to ``scale``
+    decimal digits, as PostgreSQL does.
     """
+    cls = n.__class__
     try:
-        nt = n.as_tuple()
-    except AttributeError:
-        raise TypeError("numeric field requires Decimal value (got %r)" % n)
-    digits = []
-    if isinstance(nt.exponent, str):
+        if cls is int:
+            coef, exp = n, 0
+        elif cls is Decimal:
+            coef, exp = decimal_parts(str(n))
+        elif cls is float:
+            coef, exp = decimal_parts(repr(n), "e")
+        elif isinstance(n, Decimal):
+            coef, exp = decimal_parts(str(n))
+        elif isinstance(n, float):
+            coef, exp = decimal_parts(repr(float(n)), "e")
+        elif isinstance(n, numbers.Integral) and not isinstance(n, bool):
+            coef, exp = int(n), 0
+        else:
+            raise TypeError(
+                "numeric field requires Decimal, int or float value (got %r)" % n
+            )
+    except ValueError:
         # NaN, Inf, -Inf
-        ndigits = 0
-        weight = 0
-        sign = 0xC000
-        dscale = 0
-    else:
-        decdigits = list(reversed(nt.digits + (nt.exponent % 4) * (0,)))
-        weight = 0
-        while decdigits:
-            if any(decdigits[:4]):
-                break
+        return NUMERIC_NAN
+    sign = 0
+    if coef < 0:
+        coef, sign = -coef, 0x4000
+    if scale is not None:
+        if exp < -scale:
+            unit = 10 ** (-scale - exp)
+            coef, rest = divmod(coef, unit)
+            coef += 2 * rest >= unit
+            exp = -scale
+        elif exp > -scale:
+            coef *= 10 ** (exp + scale)
+            exp = -scale
+    dscale = -exp if exp < 0 else 0
+    if not coef:
+        return ("ihhHH", (8, 0, 0, 0, dscale))
+    # align the coefficient to base-NBASE digits
+    shift = exp % 4
+    coef *= POW10[shift]
+    weight = (exp - shift) // 4
+    digits = []
+    while coef:
+        coef, digit = divmod(coef, 10000)
+        if digit or digits:
+            digits.append(digit)
+        else:
+            # trailing zero digit
             weight += 1
-            del decdigits[:4]
-        while decdigits:
-            digits.insert(0, ndig(decdigits[:4]))
-            del decdigits[:4]
-        ndigits = len(digits)
-        weight += nt.exponent // 4 + ndigits - 1
-        sign = nt.sign * 0x4000
-        dscale = -min(0, nt.exponent)
-    data = [ndigits, weight, sign, dscale] + digits
-    return ("ihhHH%dH" % ndigits, [2 * len(data)] + data)
+    digits.reverse()
+    ndigits = len(digits)
+    if ndigits < len(NUMERIC_FORMATS):
+        fmt = NUMERIC_FORMATS[ndigits]
+    else:
+        fmt = "ihhHH%dH" % ndigits
+    return (
+        fmt,
+        [2 * ndigits + 8, ndigits, weight + ndigits - 1, sign, dscale] + digits,
+    )
+
+
+class NumericFormatter(object):
+    """
+    Formatter for numeric columns, as :func:`numeric`, with an optional
+    cache of encoded values, which saves time where values repeat, as
+    prices do::
+
+        class PriceCopyManager(CopyManager):
+            type_formatters = {"numeric": NumericFormatter(maxsize=4096)}
+
+    :param maxsize: number of values cached for each column, or 0 for none
+    :type maxsize: int
+
+    :param scale: decimal digits after the decimal point, or None
+        for values as given.  It is set from the column type.
+    :type scale: int
+    """
+
+    def __init__(self, maxsize=0, scale=None):
+        self.maxsize = maxsize
+        self.scale = scale
+        self.cached = None
+        if maxsize:
+            self.cached = functools.lru_cache(maxsize)(self.encode_key)
+
+    def __getstate__(self):
+        return (self.maxsize, self.scale)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __call__(self, n):
+        if self.cached is None:
+            return numeric(n, self.scale)
+        # equal values of different types or exponents may encode
+        # differently, unless the column scale is fixed
+        if self.scale is None and isinstance(n, Decimal):
+            key = (n.__class__, n, str(n))
+        else:
+            key = (n.__class__, n)
+        try:
+            return self.cached(key)
+        except TypeError:
+            # unhashable
+            return numeric(n, self.scale)
 
+    def encode_key(self, key):
+        fmt, data = numeric(key[1], self.scale)
+        packed = struct.pack(">" + fmt, *data)
+        return ("%ds" % len(packed), (packed,))
 
-def ndig(a):
-    res = 0
-    for i, d in enumerate(a):
-        res += d * 10**i
-    return res
+    def with_scale(self, scale):
+        "formatter for a column with the given scale"
+        return self.__class__(self.maxsize, scale)
+
+    def cache_info(self):
+        "cache statistics, as for ``functools.lru_cache``"
+        return self.cached.cache_info() if self.cached else None
 
 
 def jsonb_formatter(val):
@@ -110,10 +352,29 @@ def jsonb_formatter(val):
     return "ib%is" % size, (size + 1, 1, val)
 
 
-def uuid_formatter(guid):
+def uuid_value(guid):
+    "16 bytes of a UUID given as ``uuid.UUID``, hex string or bytes"
+    if guid.__class__ is uuid.UUID:
+        return guid.bytes
     if isinstance(guid, str):
-        guid = uuid.UUID(guid)
-    return "i2Q", (16, (guid.int >> 64) & MAX_INT64, guid.int & MAX_INT64)
+        # canonical strings, with or without hyphens, skip uuid.UUID
+        digits = guid.replace("-", "")
+        if len(digits) == 32:
+            try:
+                data = bytes.fromhex(digits)
+            except ValueError:
+                data = None
+            if data is not None and len(data) == 16:
+                return data
+        return uuid.UUID(guid).bytes
+    if isinstance(guid, (bytes, bytearray)):
+        if len(guid) != 16:
+            raise ValueError("bytes is not a 16-char string")
+        return bytes(guid)
+    return guid.bytes
+
+
+uuid_formatter = converted_formatter("16s", uuid_value)
 
 
 type_formatters = {
@@ -125,7 +386,7 @@ type_formatters = {
     "float8": simple_formatter("d"),
     "varchar": str_formatter,
     "bpchar": str_formatter,
-    "bytea": str_formatter,
+    "bytea": bytea_formatter,
     "text": str_formatter,
     "json": str_formatter,
     "jsonb": jsonb_formatter,
@@ -133,7 +394,7 @@ type_formatters = {
     "time": time_formatter,
     "timestamp": timestamp,
     "timestamptz": timestamp,
-    "numeric": numeric,
+    "numeric": NumericFormatter(),
     "uuid": uuid_formatter,
 }
 
@@ -155,6 +416,8 @@ def array_formatter(typelem, formatter, val):
 
     each element, unnested
     """
+    if is_ndarray(val):
+        val = ndarray_list(val)
     info = util.array_info(val)
     ndim, lengths = info[0], info[1:]
     if ndim == 0:
@@ -169,6 +432,87 @@ def array_formatter(typelem, formatter, val):
     return str_formatter(struct.pack("".join(fmt), *data))
 
 
+def is_ndarray(val):
+    # numpy is not imported here, but must be if val is an array
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(val, np.ndarray)
+
+
+def ndarray_list(val):
+    "nested lists of the python values of a numpy array"
+    if val.dtype.kind in "mM":
+        import numpy as np
+
+        unit, _ = np.datetime_data(val.dtype)
+        if unit in ("ns", "ps", "fs", "as"):
+            # tolist() gives these as integers
+            val = val.astype("%s8[us]" % val.dtype.kind)
+    return val.tolist()
+
+
+class ArrayFormatter(object):
+    """
+    Formatter of arrays of a fixed-width element type.
+
+    Flat lists and tuples without nulls are packed with a single struct
+    format, and numpy arrays of any shape are converted with the
+    vectorized encoders of :mod:`pgcopy.columnar`.  Anything else is
+    formatted element by element by :func:`array_formatter`.
+    """
+
+    def __init__(self, att, formatter):
+        self.typelem = att.typelem
+        self.type_name = att.type_name
+        self.formatter = formatter
+        fmt, self.size = fixed_format(formatter)
+        self.code = fmt
+        self.convert = converter(formatter)
+
+    def __call__(self, val):
+        if val.__class__ in (list, tuple) and self.code != "i?":
+            try:
+                return self.format_flat(val)
+            except (struct.error, AttributeError):
+                # nulls or nested arrays, which the struct format or the
+                # value conversion do not accept
+                pass
+        elif is_ndarray(val):
+            return self.format_ndarray(val)
+        return array_formatter(self.typelem, self.formatter, val)
+
+    def format_flat(self, val):
+        n = len(val)
+        data = [self.size] * (2 * n)
+        data[1::2] = val if self.convert is None else map(self.convert, val)
+        fmt = ">5i" + self.code * n
+        return str_formatter(struct.pack(fmt, 1, 0, self.typelem, n, 1, *data))
+
+    def format_ndarray(self, val):
+        import numpy as np
+
+        from . import columnar
+
+        encode = columnar.column_encoders.get(self.type_name)
+        kind = val.dtype.kind
+        if (
+            encode is None
+            or val.ndim == 0
+            or kind in "OV"
+            or np.ma.isMaskedArray(val)
+            or (kind in "mM" and np.isnat(val).any())
+        ):
+            return array_formatter(self.typelem, self.formatter, val)
+        values = encode(val.ravel())
+        fields = [("size", ">i4"), ("value", values.dtype)]
+        elems = np.empty(values.size, dtype=fields)
+        elems["size"] = values.dtype.itemsize
+        elems["value"] = values
+        dims = [1] * 2 * val.ndim
+        dims[::2] = val.shape
+        header = struct.pack(">%di" % (3 + len(dims)), val.ndim, 0, self.typelem, *dims)
+        return str_formatter(header + elems.tobytes())
+
+
 def null(att, _, formatter):
     if not att.not_null:
         return null_formatter(formatter)
@@ -185,6 +529,8 @@ def null(att, _, formatter):
 def array(att, _, formatter):
     if att.type_category != "A":
         return formatter
+    if fixed_format(formatter):
+        return ArrayFormatter(att, formatter)
     return lambda v: array_formatter(att.typelem, formatter, v)
 
 
@@ -230,6 +576,451 @@ def diagnostic(att, encoding, formatter):
     return f
 
 
+NULL_FIELD = struct.pack(">i", -1)
+
+
+BYTES_FORMATTERS = (str_formatter, bytea_formatter)
+
+MemoStats = collections.namedtuple("MemoStats", "hit_rate hits misses maxsize currsize")
+
+
+def memo_cache(maxsize, func):
+    return functools.lru_cache(maxsize, typed=True)(func)
+
+
+class Fallback(Exception):
+    "raised by generated encoders to defer to the generic path"
+
+
+class RowEncoder(object):
+    """
+    Binary serializer for records of a particular list of columns.
+
+    Formatters for each column are stacked as in previous versions and
+    are available as :attr:`formatters`.  From these, a specialized
+    :meth:`encode` function is generated, much like ``namedtuple`` does,
+    which inlines null checks, string encoding and length words and
+    packs runs of fixed-width columns with a single precompiled
+    ``struct.Struct``.  :meth:`encode_into` does the same, appending to
+    a ``bytearray`` instead of returning ``bytes``, and
+    :meth:`encode_deferred` appends to a :class:`DeferringBuffer`, which
+    keeps large bytea and text values rather than copying them.  If
+    anything goes wrong, the record is handed to :meth:`encode_slow`,
+    which raises the usual diagnostic errors.
+
+    Values of the columns in ``memoize``, a dict of cache sizes by
+    column name, are encoded through a bounded LRU cache of their
+    encoded fields, whose statistics are given by :meth:`memo_stats`.
+
+    Encoders can be pickled, provided the base formatters can be.
+    Only the column attributes, base formatters, encoding and memoized
+    columns are pickled, and the encoder is compiled again when
+    unpickled, with empty caches.
+    """
+
+    wrappers = [encode, maxsize, array, diagnostic, null]
+    core_wrappers = [encode, maxsize, array]
+
+    def __init__(self, atts, formatters, encoding, memoize=None):
+        self.atts = atts
+        self.base_formatters = formatters
+        self.encoding = encoding
+        self.memoize = dict(memoize or {})
+        self.memos = {}
+        self.formatters = [self.wrap(self.wrappers, *c) for c in self.columns()]
+        self.encode, self.encode_into, self.encode_deferred = self.compile()
+
+    def __getstate__(self):
+        return (self.atts, self.base_formatters, self.encoding, self.memoize)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def columns(self):
+        return zip(self.atts, self.base_formatters)
+
+    def wrap(self, funcs, att, formatter):
+        reducer = lambda f, mf: mf(att, self.encoding, f)
+        return functools.reduce(reducer, funcs, formatter)
+
+    def encode_slow(self, record):
+        fmt = [">h"]
+        rdat = [len(self.formatters)]
+        for formatter, val in zip(self.formatters, record):
+            f, d = formatter(val)
+            fmt.append(f)
+            rdat.extend(d)
+        return struct.pack("".join(fmt), *rdat)
+
+    def compile(self):
+        count = len(self.atts)
+        namespace = {
+            "slow": self.encode_slow,
+            "slow_into": self.encode_slow_into,
+            "pack": struct.pack,
+            "pack_len": struct.Struct(">i").pack,
+            "NULL": NULL_FIELD,
+            "ENC": self.encoding,
+            "Fallback": Fallback,
+            "BYTES": bytea_buffer,
+            "BYTEA": bytea_value,
+        }
+        # pairs of lines for encode and encode_into, and for encode_deferred
+        body = []
+        run_fmt, run_args = ["h"], [str(count)]
+
+        def flush_run():
+            if not run_fmt:
+                return
+            name = "S%d" % len(body)
+            if run_fmt == ["h"]:
+                namespace[name] = struct.pack(">h", count)
+                lines = ["append(%s)" % name]
+            else:
+                namespace[name] = struct.Struct(">" + "".join(run_fmt)).pack
+                lines = ["append(%s(%s))" % (name, ", ".join(run_args))]
+            body.append((lines, lines))
+            del run_fmt[:], run_args[:]
+
+        for i, (att, formatter) in enumerate(self.columns()):
+            v = "v%d" % i
+            fixed = None if att.type_category == "A" else fixed_format(formatter)
+            memo = self.memoize.get(att.attname)
+            if fixed and converter(formatter):
+                convert = converter(formatter)
+                if memo:
+                    convert = self.memos[att.attname] = memo_cache(memo, convert)
+                namespace["C%d" % i] = convert
+                arg = "C%d(%s)" % (i, v)
+            else:
+                arg = v
+            if fixed and att.not_null:
+                run_fmt.append(fixed[0])
+                run_args.extend([str(fixed[1]), arg])
+                continue
+            flush_run()
+            if fixed:
+                name = "S%d" % len(body)
+                namespace[name] = struct.Struct(">" + fixed[0]).pack
+                lines = ["append(%s(%d, %s))" % (name, fixed[1], arg)]
+                deferred = lines
+            elif memo:
+                name = "M%d" % i
+                namespace[name] = self.memos[att.attname] = self.memo_field(
+                    att, formatter, memo
+                )
+                if att.type_name == "numeric" and att.type_mod < 0:
+                    # equal values may differ in their decimal digits
+                    lines = ["append(%s(%s, str(%s)))" % (name, v, v)]
+                else:
+                    lines = ["append(%s(%s))" % (name, v)]
+                deferred = lines
+            elif formatter in BYTES_FORMATTERS and att.type_category != "A":
+                lines = self.compile_bytes(att, v)
+                deferred = self.compile_bytes(att, v, deferred=True)
+            else:
+                name = "F%d" % i
+                namespace[name] = self.wrap(self.core_wrappers, att, formatter)
+                lines = [
+                    "f, d = %s(%s)" % (name, v),
+                    'append(pack(">" + f, *d))',
+                ]
+                deferred = lines
+            if not att.not_null:
+                test = ["if %s is None:" % v, "    append(NULL)", "else:"]
+                lines = test + ["    " + line for line in lines]
+                deferred = test + ["    " + line for line in deferred]
+            body.append((lines, deferred))
+        flush_run()
+
+        lines = ["        " + line for lines, _ in body for line in lines]
+        if len(lines) == 1:
+            expr = lines[0].strip()[len("append(") : -1]
+            into = ["        buf += " + expr]
+            lines = ["        return " + expr]
+        else:
+            into = ["        append = buf.extend"] + lines
+            lines = ["        parts = []", "        append = parts.append"] + lines
+            lines.append('        return b"".join(parts)')
+
+        source = ["def encode(record):"] + self.prologue("return slow(record)")
+        source += ["    try:"] + lines
+        source += ["    except Exception:", "        return slow(record)", ""]
+        source += ["def encode_into(record, buf):"]
+        source += self.prologue("return slow_into(record, buf)")
+        source += ["    start = len(buf)", "    try:"] + into
+        source += ["    except Exception:", "        del buf[start:]"]
+        source += ["        slow_into(record, buf)", ""]
+        if any(lines is not deferred for lines, deferred in body):
+            deferred = ["        " + line for _, lines in body for line in lines]
+            source += ["def encode_deferred(record, buf):"]
+            source += self.prologue("return slow_into(record, buf)")
+            source += ["    start = len(buf)", "    try:"]
+            source += ["        append = buf.extend"] + deferred
+            source += ["    except Exception:", "        buf.truncate(start)"]
+            source += ["        slow_into(record, buf)", ""]
+        self.source = "\n".join(source)
+        exec(self.source, namespace)
+        encode_deferred = namespace.get("encode_deferred", namespace["encode_into"])
+        return namespace["encode"], namespace["encode_into"], encode_deferred
+
+    def memo_field(self, att, formatter, maxsize):
+        "cached function returning the encoded field of a value"
+        formatter = self.wrap(self.core_wrappers, att, formatter)
+
+        def encode_field(v, *_):
+            f, d = formatter(v)
+            return struct.pack(">" + f, *d)
+
+        return memo_cache(maxsize, encode_field)
+
+    def memo_stats(self):
+        "cache statistics of memoized columns, by column name"
+        stats = {}
+        for column, cached in self.memos.items():
+            info = cached.cache_info()
+            lookups = info.hits + info.misses
+            rate = info.hits / lookups if lookups else 0.0
+            stats[column] = MemoStats(rate, *info)
+        return stats
+
+    def prologue(self, fallback):
+        names = ["v%d" % i for i in range(len(self.atts))]
+        lines = ["    try:"]
+        # records may be one-shot iterables, to be read again by the fallback
+        lines += ["        if not isinstance(record, (tuple, list)):"]
+        lines += ["            record = tuple(record)"]
+        lines += ["        %s, = record" % ", ".join(names)]
+        lines += ["    except (TypeError, ValueError):", "        " + fallback]
+        notnull = [v for att, v in zip(self.atts, names) if att.not_null]
+        if notnull:
+            test = " or ".join("%s is None" % v for v in notnull)
+            lines += ["    if %s:" % test, "        " + fallback]
+        return lines
+
+    def encode_slow_into(self, record, buf):
+        buf += self.encode_slow(record)
+
+    def compile_bytes(self, att, v, deferred=False):
+        lines = []
+        if att.type_name in ("varchar", "bpchar") and att.type_mod >= 0:
+            # postgres reports size + 4
+            size = att.type_mod - 4
+            lines += ["if len(%s) > %d:" % (v, size), "    %s = %s[:%d]" % (v, v, size)]
+        if att.type_name in ("varchar", "text", "json") or att.type_category == "E":
+            lines += [
+                "if %s.__class__ is str:" % v,
+                "    %s = %s.encode(ENC)" % (v, v),
+                "elif %s.__class__ is not bytes:" % v,
+                "    raise Fallback",
+            ]
+        elif att.type_name != "bytea":
+            lines += ["if %s.__class__ is not bytes:" % v, "    raise Fallback"]
+        elif not deferred:
+            lines += [
+                "if %s.__class__ is not bytes:" % v,
+                "    %s = BYTES(%s)" % (v, v),
+            ]
+        if not deferred:
+            return lines + ["append(pack_len(len(%s)))" % v, "append(%s)" % v]
+        if att.type_name == "bytea":
+            lines += [
+                "if %s.__class__ is bytes:" % v,
+                "    n = len(%s)" % v,
+                "else:",
+                "    %s, n = BYTEA(%s, buf.threshold)" % (v, v),
+            ]
+        else:
+            lines += ["n = len(%s)" % v]
+        return lines + [
+            "append(pack_len(n))",
+            "if n < buf.threshold:",
+            "    append(%s)" % v,
+            "else:",
+            "    buf.defer(%s, n)" % v,
+        ]
+
+
+class DeferringBuffer(bytearray):
+    """
+    Buffer for :meth:`RowEncoder.encode_deferred`, into which values of
+    at least ``threshold`` bytes are not copied.  Each is kept in
+    :attr:`deferred`, with the offset in the buffer where it belongs, and
+    is written there by :meth:`write_to` and :meth:`parts`.
+    """
+
+    def __init__(self, data=b"", threshold=LARGE_VALUE_SIZE):
+        super().__init__(data)
+        self.threshold = threshold
+        self.deferred = []
+        self.deferred_size = 0
+
+    def defer(self, value, size):
+        self.deferred.append((len(self), value, size))
+        self.deferred_size += size
+
+    def truncate(self, size):
+        "keep the first ``size`` bytes, and the values deferred before"
+        del self[size:]
+        # a value at the end of a row has the offset of the next row
+        while self.deferred and self.deferred[-1][0] > size:
+            self.deferred_size -= self.deferred.pop()[2]
+
+    def total(self):
+        "size of the data including deferred values"
+        return len(self) + self.deferred_size
+
+    def write_to(self, stream):
+        "write the data to a file-like object and clear the buffer"
+        size = self.total()
+        if not self.deferred:
+            stream.write(self)
+        else:
+            pos = 0
+            with memoryview(self) as view:
+                for offset, value, n in self.deferred:
+                    with view[pos:offset] as data:
+                        stream.write(data)
+                    write_value(stream, value, n)
+                    pos = offset
+                with view[pos:] as data:
+                    stream.write(data)
+            del self.deferred[:]
+            self.deferred_size = 0
+        del self[:]
+        return size
+
+    def parts(self):
+        """
+        Remove and return the data, as a list of bytes-like objects and
+        of ``[fileobj, size]`` lists for values in files.
+        """
+        parts = []
+        pos = 0
+        for offset, value, n in self.deferred:
+            parts.append(bytes(self[pos:offset]))
+            parts.append([value, n] if hasattr(value, "read") else value)
+            pos = offset
+        parts.append(bytes(self[pos:]))
+        del self[:], self.deferred[:]
+        self.deferred_size = 0
+        return [part for part in parts if len(part)]
+
+
+class EncodingReader(object):
+    """
+    Read-only file-like object for binary copy data, which encodes
+    records as they are read.
+
+    :param encoder: the row encoder
+    :type encoder: RowEncoder
+
+    :param data: the data to be encoded
+    :type data: iterable of iterables
+
+    :param threshold: size in bytes of values which are read from the
+        original objects rather than copied into the buffer
+    :type threshold: int
+
+    ``read(n)`` returns exactly ``n`` bytes, except at the end of the data.
+    An exception raised while encoding is kept as :attr:`error`.
+    """
+
+    def __init__(self, encoder, data, threshold=LARGE_VALUE_SIZE):
+        self.encode_into = encoder.encode_deferred
+        self.records = iter(data)
+        self.buf = DeferringBuffer(BINCOPY_HEADER, threshold)
+        # data before the buffer, which holds large values
+        self.parts = collections.deque()
+        self.pending = 0
+        self.done = False
+        self.error = None
+        self.size = 0
+
+    def read(self, size=-1):
+        buf = self.buf
+        try:
+            if not self.done and (size < 0 or self.pending + buf.total() < size):
+                self.fill(size if size < 0 else size - self.pending)
+            if buf.deferred:
+                self.pending += buf.total()
+                self.parts.extend(buf.parts())
+            if self.parts:
+                data = self.read_parts(size)
+                self.size += len(data)
+                return data
+        except Exception as e:
+            self.error = e
+            raise
+        if size < 0 or size >= len(buf):
+            data = bytes(buf)
+            del buf[:]
+        else:
+            with memoryview(buf) as view:
+                data = bytes(view[:size])
+            del buf[:size]
+        self.size += len(data)
+        return data
+
+    def read_parts(self, size):
+        parts = self.parts
+        if size < 0:
+            size = self.pending + len(self.buf)
+        pieces = []
+        try:
+            while size and parts:
+                part = parts[0]
+                if isinstance(part, list):
+                    fileobj, left = part
+                    piece = read_exactly(fileobj, min(size, left, BLOCK_SIZE))
+                    part[1] -= len(piece)
+                    if not part[1]:
+                        parts.popleft()
+                else:
+                    piece = part[:size]
+                    if len(piece) == len(part):
+                        parts.popleft()
+                    else:
+                        parts[0] = memoryview(part)[size:]
+                pieces.append(piece)
+                size -= len(piece)
+                self.pending -= len(piece)
+        except Exception:
+            # keep the data read so far for remainder()
+            parts.extendleft(reversed(pieces))
+            self.pending += sum(map(len, pieces))
+            raise
+        if size and self.buf:
+            pieces.append(self.buf[:size])
+            del self.buf[:size]
+        return b"".join(pieces)
+
+    def remainder(self):
+        "encoded data not yet read, which ends on a row boundary"
+        pieces = []
+        for part in self.parts:
+            if isinstance(part, list):
+                # the copy is failing, so only the size matters
+                part = bytes(part[1])
+            pieces.append(part)
+        self.parts.clear()
+        self.pending = 0
+        pieces.append(self.buf)
+        data = b"".join(pieces)
+        del self.buf[:]
+        return data
+
+    def fill(self, size):
+        buf = self.buf
+        encode_into = self.encode_into
+        for record in self.records:
+            encode_into(record, buf)
+            if 0 <= size <= buf.total():
+                return
+        buf += BINCOPY_TRAILER
+        self.done = True
+
+
 class CopyManager(object):
     """
     Facility for bulk-loading data using binary copy.
@@ -252,16 +1043,47 @@ class CopyManager(object):
     :type cols: iterable of str
 
     :raises ValueError: if the table or columns do not exist.
+
+    Set :attr:`plan_cache` to a :class:`pgcopy.cache.PlanCache` to share
+    the column types and row encoder between copy managers for the same
+    table and columns.
+
+    Set :attr:`memoize` to a dict of cache sizes by column name to cache
+    the encoded values of columns with few distinct values, such as
+    status codes or tenant keys::
+
+        class EventCopyManager(CopyManager):
+            memoize = {"status": 64, "tenant_id": 1024}
+
+    Values are cached by equality and type, so they must be hashable;
+    others are encoded as usual.  Fixed-width numeric columns are not
+    cached, as they are cheaper to encode than to look up.  Cache
+    statistics are returned by :meth:`memo_stats`.
     """
 
     type_formatters = {}
+    plan_cache = None
+    large_value_size = LARGE_VALUE_SIZE
+    memoize = {}
+    is_async = False
 
     def __init__(self, conn, table, cols):
+        self._connect(conn, table, cols)
+        self.compile()
+
+    def _connect(self, conn, table, cols):
         self._type_formatters = {
             **type_formatters,
             **self.type_formatters,
         }
         self.backend = backend.for_connection(conn)
+        is_async = getattr(self.backend, "is_async", False)
+        if is_async and not self.is_async:
+            message = "use AsyncCopyManager with %s" % conn.__class__.__name__
+            raise errors.UnsupportedConnectionError(message)
+        if self.is_async and not is_async:
+            message = "%s is not an asynchronous connection" % conn.__class__.__name__
+            raise errors.UnsupportedConnectionError(message)
         self.implements_threading_copy = hasattr(self.backend, "threading_copy")
         if not self.implements_threading_copy:
             self.threading_copy = self.copy
@@ -269,35 +1091,158 @@ class CopyManager(object):
         if "." in table:
             self.schema, self.table = table.split(".", 1)
         else:
-            self.schema, self.table = util.get_schema(conn, table), table
+            self.schema, self.table = None, table
         self.cols = cols
-        self.compile()
+
+    @classmethod
+    def for_tables(cls, conn, tables):
+        """
+        Create copy managers for many tables, inspecting the database for
+        the column types of all of them in a single query.
+
+        :param conn: a database connection
+
+        :param tables: columns into which to copy data, by table name.
+            Schema may be specified using dot notation: ``schema.table``.
+        :type tables: dict
+
+        Returns a dict of copy managers by table name.  Tables given
+        without a schema take one more query, to find their schema.
+
+        :raises ValueError: if a table or column does not exist.
+        """
+        managers = {}
+        for table, cols in tables.items():
+            mgr = managers[table] = cls.__new__(cls)
+            mgr._connect(conn, table, cols)
+        mgrs = list(managers.values())
+        unqualified = [m for m in mgrs if m.schema is None]
+        if unqualified:
+            schemas = util.get_schemas(conn, [m.table for m in unqualified])
+            for mgr, schema in zip(unqualified, schemas):
+                mgr.schema = schema
+        if mgrs:
+            encoding = mgrs[0].backend.get_encoding()
+            pairs = [(m.schema, m.table) for m in mgrs]
+            type_dicts = inspect.get_types_many(mgrs[0].backend, pairs)
+            for mgr, pair in zip(mgrs, pairs):
+                mgr.set_types(type_dicts[pair], encoding)
+        return managers
 
     def compile(self):
-        self.formatters = []
-        type_dict = inspect.get_types(self.backend, self.schema, self.table)
         encoding = self.backend.get_encoding()
+        cache = self.plan_cache
+        if cache is None:
+            self.load_types(encoding)
+            return
+        if self.schema is None:
+            # the schema found by this session's search path
+            self.schema = util.get_schema(self.backend.conn, self.table)
+        key = PlanKey(
+            self.__class__,
+            self.backend.identity(),
+            self.schema,
+            self.table,
+            tuple(self.cols),
+            encoding,
+        )
+        plan = cache.get(key)
+        if plan is not None and cache.check_ddl:
+            stamp = inspect.get_ddl_stamp(self.backend, plan.schema, self.table)
+            if stamp != plan.ddl_stamp:
+                plan = None
+        if plan is not None:
+            self.encoder = plan.encoder
+            self.formatters = self.encoder.formatters
+            return
+        self.load_types(encoding)
+        stamp = None
+        if cache.check_ddl:
+            stamp = inspect.get_ddl_stamp(self.backend, self.schema, self.table)
+        cache.put(key, self.schema, self.encoder, stamp)
+
+    def load_types(self, encoding):
+        "inspect the database for the column types"
+        if self.schema is None:
+            self.schema = util.get_schema(self.backend.conn, self.table)
+        type_dict = inspect.get_types(self.backend, self.schema, self.table)
+        self.set_types(type_dict, encoding)
+
+    def set_types(self, type_dict, encoding):
+        "build the row encoder from column attributes"
+        atts = []
         for column in self.cols:
             att = type_dict.get(column)
             if att is None:
                 message = '"%s" is not a column of table "%s"."%s"'
                 raise ValueError(message % (column, self.schema, self.table))
-            funcs = [encode, maxsize, array, diagnostic, null]
-            reducer = lambda f, mf: mf(att, encoding, f)
-            f = functools.reduce(reducer, funcs, self.get_formatter(att))
-            self.formatters.append(f)
+            atts.append(att)
+        formatters = [self.get_formatter(att) for att in atts]
+        self.encoder = RowEncoder(atts, formatters, encoding, self.memoize)
+        self.formatters = self.encoder.formatters
 
     def get_formatter(self, att):
         if att.type_category == "E":
             return str_formatter
         try:
-            return self._type_formatters[att.type_name]
+            formatter = self._type_formatters[att.type_name]
         except KeyError:
             raise TypeError("type {} is not supported".format(att.type_name))
+        with_scale = getattr(formatter, "with_scale", None)
+        if with_scale is not None and att.type_mod >= 0:
+            # postgres reports ((precision << 16) | scale) + 4, with an
+            # 11-bit signed scale
+            return with_scale((((att.type_mod - 4) & 0x7FF) ^ 1024) - 1024)
+        return formatter
 
-    def copy(self, data, fobject_factory=tempfile.TemporaryFile):
+    def memo_stats(self):
         """
-        Copy data into the database using a temporary file.
+        Cache statistics of the memoized columns, as a dict of
+        ``MemoStats(hit_rate, hits, misses, maxsize, currsize)`` by column
+        name.
+        """
+        return self.encoder.memo_stats()
+
+    def plan(self):
+        """
+        The column plan: target table, columns, client encoding and column
+        types, as a dict which can be serialized as JSON.
+        """
+        return {
+            "schema": self.schema,
+            "table": self.table,
+            "columns": list(self.cols),
+            "encoding": self.encoder.encoding,
+            "attributes": [att._asdict() for att in self.encoder.atts],
+        }
+
+    @classmethod
+    def from_plan(cls, plan):
+        """
+        Create a copy manager from a column plan, without a database
+        connection.
+
+        :param plan: a column plan, as returned by :meth:`plan`
+        :type plan: dict
+
+        Such a copy manager can only serialize data, using
+        :meth:`write_file` or :meth:`writestream`.
+        """
+        self = cls.__new__(cls)
+        self._type_formatters = {
+            **type_formatters,
+            **cls.type_formatters,
+        }
+        self.backend = None
+        self.schema, self.table = plan["schema"], plan["table"]
+        self.cols = plan["columns"]
+        atts = [inspect.Attribute(**att) for att in plan["attributes"]]
+        self.set_types({att.attname: att for att in atts}, plan["encoding"])
+        return self
+
+    def copy(self, data, fobject_factory=None, block_size=BLOCK_SIZE):
+        """
+        Copy data into the database.
 
         :param data: the data to be inserted
         :type data: iterable of iterables
@@ -305,56 +1250,408 @@ class CopyManager(object):
         :param fobject_factory: a tempfile factory
         :type fobject_factory: function
 
-        Data is serialized first in its entirety and then sent to the database.
-        By default, a temporary file on disk is used.  If you have enough memory,
-        you can get a slight performance benefit with in-memory storage::
+        :param block_size: size in bytes of blocks sent to the database
+        :type block_size: int
 
-            from io import BytesIO
-            mgr.copy(records, BytesIO)
+        By default, the database adaptor reads from a file-like object
+        which encodes records on demand, so data is serialized as it is
+        sent, without a temporary file or a second thread.  If
+        serialization fails, the copy is aborted, and the transaction must
+        be rolled back.
 
-        For very large datasets, serialization can be done directly to the
-        database connection using :meth:`threading_copy`.
+        If ``fobject_factory`` is given, data is serialized first in its
+        entirety into the file object it returns, and then sent to the
+        database.  Nothing is sent if serialization fails.  The strategies
+        in :mod:`pgcopy.buffers` also set the size of reads by the
+        adaptor::
 
-        In most circumstances, however, data transfer over the network and
-        db processing take significantly more time than writing and reading
-        a temporary file on a local disk.
+            from pgcopy import buffers
+            mgr.copy(records, buffers.Spooled(max_size=256 << 20))
+
+        For very large datasets, serialization can overlap with sending data
+        to the database connection using :meth:`threading_copy`.
 
         ``ValueError`` is raised if a null value is provided for a column
         with non-null constraint.
+
+        Returns the number of bytes copied.
         """
-        self._copy(
-            data, self.backend.copy(self.schema, self.table, self.cols, fobject_factory)
+        if fobject_factory is None:
+            reader = EncodingReader(self.encoder, data, self.large_value_size)
+            self._stream(reader, block_size)
+            return reader.size
+        return self._copy(
+            self.backend.copy(self.schema, self.table, self.cols, fobject_factory),
+            functools.partial(self.writestream, data, block_size=block_size),
         )
 
-    def threading_copy(self, data):
+    def threading_copy(self, data, block_size=BLOCK_SIZE):
         """
         Copy data, serializing directly to the database.
 
         :param data: the data to be inserted
         :type data: iterable of iterables
+
+        :param block_size: size in bytes of blocks sent to the database
+        :type block_size: int
+
+        Returns the number of bytes copied.
         """
-        self._copy(
-            data, self.backend.threading_copy(self.schema, self.table, self.cols)
+        return self._copy(
+            self.backend.threading_copy(self.schema, self.table, self.cols),
+            functools.partial(self.writestream, data, block_size=block_size),
         )
 
-    def _copy(self, data, copy):
+    def copy_chunked(
+        self,
+        data,
+        rows_per_chunk=100000,
+        commit=True,
+        start=0,
+        checkpoint=None,
+        block_size=BLOCK_SIZE,
+    ):
+        """
+        Copy data in successive copies of at most ``rows_per_chunk`` records.
+
+        :param data: the data to be inserted
+        :type data: iterable of iterables
+
+        :param rows_per_chunk: number of records in each copy
+        :type rows_per_chunk: int
+
+        :param commit: commit the connection after each copy
+        :type commit: bool
+
+        :param start: number of records at the beginning of ``data`` to skip
+        :type start: int
+
+        :param checkpoint: function called with a ``Checkpoint``
+            after each copy
+        :type checkpoint: function
+
+        :param block_size: size in bytes of blocks sent to the database
+        :type block_size: int
+
+        Each chunk is sent with :meth:`copy`, and committed if ``commit``
+        is true, so that a long load does not run in a single transaction.
+        A ``Checkpoint(rows, offset)`` records the number of records copied
+        by this call and the offset in ``data`` of the next record.  To
+        resume after a failure, pass the same data with ``start`` set to
+        the offset of the last checkpoint::
+
+            checkpoints = []
+            try:
+                mgr.copy_chunked(records(), checkpoint=checkpoints.append)
+            except Exception:
+                conn.rollback()
+                offset = checkpoints[-1].offset if checkpoints else 0
+                mgr.copy_chunked(records(), start=offset)
+
+        Returns the last checkpoint.
+        """
+        it = itertools.islice(data, start, None)
+        state = Checkpoint(0, start)
+        while True:
+            chunk = list(itertools.islice(it, rows_per_chunk))
+            if not chunk:
+                return state
+            self.copy(chunk, block_size=block_size)
+            if commit:
+                self.backend.conn.commit()
+            state = Checkpoint(state.rows + len(chunk), state.offset + len(chunk))
+            if checkpoint is not None:
+                checkpoint(state)
+
+    def write_file(self, data, path, block_size=BLOCK_SIZE):
+        """
+        Write data to a binary copy file.
+
+        :param data: the data to be written
+        :type data: iterable of iterables
+
+        :param path: path of the file
+        :type path: str
+
+        :param block_size: size in bytes of blocks written to the file
+        :type block_size: int
+
+        Together with :meth:`from_plan`, data can be encoded where there
+        is no connection to the database, and loaded later using
+        :meth:`load_file`::
+
+            plan = json.dumps(CopyManager(conn, 'measurements', cols).plan())
+            # elsewhere
+            mgr = CopyManager.from_plan(json.loads(plan))
+            mgr.write_file(records, 'measurements.pgcopy')
+
+        Returns the number of bytes written.
+        """
+        with open(path, "wb") as f:
+            return self.writestream(data, f, block_size)
+
+    def load_file(self, path, read_size=BLOCK_SIZE):
+        """
+        Copy a binary copy file into the database.
+
+        :param path: path of a file written by :meth:`write_file`
+        :type path: str
+
+        :param read_size: size in bytes of blocks sent to the database
+        :type read_size: int
+
+        The file is memory-mapped and sent in blocks of ``read_size``
+        bytes.  Its columns must be those of this copy manager.
+
+        Returns the number of bytes copied.
+        """
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            reader = buffers.MmapFile(f)
+            try:
+                reader.seek(0)
+                if reader.read(len(BINCOPY_HEADER)) != BINCOPY_HEADER:
+                    raise ValueError("%s is not a binary copy file" % path)
+                reader.seek(0)
+                self._stream(reader, read_size)
+            finally:
+                reader.close()
+        return size
+
+    def multiprocessing_copy(
+        self,
+        data,
+        processes=None,
+        rows_per_chunk=10000,
+        max_pending=None,
+        mp_context=None,
+    ):
+        """
+        Copy data, serializing in parallel in a pool of processes.
+
+        :param data: the data to be inserted
+        :type data: iterable of iterables
+
+        :param processes: number of worker processes (default: cpu count)
+        :type processes: int
+
+        :param rows_per_chunk: number of records encoded by a worker at a time
+        :type rows_per_chunk: int
+
+        :param max_pending: maximum number of chunks in flight
+            (default: twice the number of processes)
+        :type max_pending: int
+
+        :param mp_context: multiprocessing context for the process pool
+        :type mp_context: multiprocessing.context.BaseContext
+
+        Records are read in chunks, which are encoded in worker processes
+        using a copy of the row encoder.  Encoded chunks are sent to the
+        database in order, streaming directly if the adaptor supports
+        :meth:`threading_copy`.  Records must be picklable, as must be any
+        formatters added by a subclass.  This pays off for wide tables with
+        types which are expensive to encode.
+        """
+        from . import process
+
+        blocks = process.encoded_blocks(
+            self.encoder, data, processes, rows_per_chunk, max_pending, mp_context
+        )
+        if self.implements_threading_copy:
+            copy = self.backend.threading_copy(self.schema, self.table, self.cols)
+        else:
+            copy = self.backend.copy(
+                self.schema, self.table, self.cols, tempfile.TemporaryFile
+            )
+        return self._copy(copy, functools.partial(self.writeblocks, blocks))
+
+    def copy_arrays(
+        self,
+        columns,
+        masks=None,
+        fobject_factory=None,
+        block_size=BLOCK_SIZE,
+    ):
+        """
+        Copy columnar data from numpy arrays.
+
+        :param columns: one 1-dimensional array for each column in ``cols``
+        :type columns: sequence of array-like
+
+        :param masks: null mask for each column, true where the value is null
+        :type masks: sequence of array-like or None
+
+        :param fobject_factory: a tempfile factory, as for :meth:`copy`
+        :type fobject_factory: function
+
+        :param block_size: approximate size in bytes of encoded blocks
+        :type block_size: int
+
+        Columns are encoded with vectorized numpy operations, without
+        creating a python object for each row.  Null values may also be
+        given by numpy masked arrays, ``NaT``, or ``None`` in object arrays.
+        Bool, integer and floating point types, date, time (as
+        ``timedelta64``), and timestamp and timestamptz (as ``datetime64``
+        in UTC) are encoded entirely in numpy, as are string columns given
+        as numpy string arrays, and uuid columns given as numpy arrays of
+        hex strings or of 16-byte values.  Object arrays of strings are encoded value
+        by value, and other types use the usual formatters.
+
+        Requires numpy.
+        """
+        from . import columnar
+
+        encoder = columnar.ColumnarEncoder(self.encoder, columns, masks)
+        return self._copy_blocks(
+            encoder.blocks(block_size), fobject_factory, block_size
+        )
+
+    def copy_dataframe(
+        self,
+        df,
+        rows_per_chunk=100000,
+        fobject_factory=None,
+        block_size=BLOCK_SIZE,
+    ):
+        """
+        Copy data from a pandas DataFrame.
+
+        :param df: a DataFrame with a column for each column in ``cols``
+        :type df: pandas.DataFrame
+
+        :param rows_per_chunk: number of rows converted at a time
+        :type rows_per_chunk: int
+
+        :param fobject_factory: a tempfile factory, as for :meth:`copy`
+        :type fobject_factory: function
+
+        :param block_size: approximate size in bytes of encoded blocks
+        :type block_size: int
+
+        The frame is serialized column by column with the same machinery as
+        :meth:`copy_arrays`, one group of ``rows_per_chunk`` rows at a time,
+        so a large frame is never copied in its entirety.
+        ``NaN``, ``NaT``, ``None`` and ``pd.NA`` are copied as null, and
+        timezone-aware datetime columns are converted to UTC.
+        """
+        from . import columnar
+
+        blocks = columnar.dataframe_blocks(
+            self.encoder, df[list(self.cols)], rows_per_chunk, block_size
+        )
+        return self._copy_blocks(blocks, fobject_factory, block_size)
+
+    def copy_arrow(
+        self,
+        data,
+        rows_per_chunk=100000,
+        fobject_factory=None,
+        block_size=BLOCK_SIZE,
+    ):
+        """
+        Copy data from Apache Arrow record batches.
+
+        :param data: arrow data with a column for each column in ``cols``
+        :type data: pyarrow.Table, pyarrow.RecordBatch,
+            pyarrow.RecordBatchReader or iterable of RecordBatch
+
+        :param rows_per_chunk: maximum number of rows encoded at a time
+        :type rows_per_chunk: int
+
+        :param fobject_factory: a tempfile factory, as for :meth:`copy`
+        :type fobject_factory: function
+
+        :param block_size: approximate size in bytes of encoded blocks
+        :type block_size: int
+
+        Validity bitmaps and value buffers are read directly.  Fixed-width
+        values only need to be byteswapped, and utf8 and binary values are
+        copied straight from the data buffer using the offsets.  Batches are
+        consumed one at a time, so a ``RecordBatchReader`` over a large
+        dataset is loaded in constant memory.  Other types, such as decimal
+        and list, are converted to python objects and use the usual
+        formatters.
+
+        Requires pyarrow and numpy.
+        """
+        from . import arrow
+
+        blocks = arrow.record_batch_blocks(
+            self.encoder, data, self.cols, rows_per_chunk, block_size
+        )
+        return self._copy_blocks(blocks, fobject_factory, block_size)
+
+    def _copy(self, copy, write):
         try:
             with copy as datastream:
-                self.writestream(data, datastream)
+                return write(datastream)
         except Exception as e:
             templ = "error doing binary copy into {0}.{1}:\n{2}"
             e.message = templ.format(self.schema, self.table, e)
             raise e
 
-    def writestream(self, data, datastream):
-        datastream.write(BINCOPY_HEADER)
-        count = len(self.cols)
+    def _copy_blocks(self, blocks, fobject_factory, block_size):
+        "copy encoded blocks, streamed unless ``fobject_factory`` is given"
+        if fobject_factory is not None:
+            return self._copy(
+                self.backend.copy(self.schema, self.table, self.cols, fobject_factory),
+                functools.partial(self.writeblocks, blocks),
+            )
+        sizes = []
+
+        def framed():
+            yield BINCOPY_HEADER
+            for block in blocks:
+                sizes.append(len(block))
+                yield block
+            yield BINCOPY_TRAILER
+
+        self._stream(backend.BlockReader(framed()), block_size)
+        return len(BINCOPY_HEADER) + sum(sizes) + len(BINCOPY_TRAILER)
+
+    def _stream(self, reader, size):
+        try:
+            self.backend.stream_copy(self.schema, self.table, self.cols, reader, size)
+        except Exception as e:
+            # adaptors may replace an exception raised by reader.read
+            if getattr(reader, "error", None) is not None:
+                e = reader.error
+            templ = "error doing binary copy into {0}.{1}:\n{2}"
+            e.message = templ.format(self.schema, self.table, e)
+            raise e
+
+    def writestream(self, data, datastream, block_size=BLOCK_SIZE):
+        """
+        Serialize data to a writable file-like object.
+
+        Records are encoded into a reusable buffer, which is written out
+        whenever it holds at least ``block_size`` bytes, so the number of
+        ``write`` calls does not depend on the width of the rows.
+        The buffer is cleared after each write, so ``datastream`` must
+        not keep a reference to the object passed to it.
+
+        Values of at least :attr:`large_value_size` bytes, in bytea and
+        text columns, are not copied into the buffer, but written out as
+        they are, between the data before and after them.
+
+        Returns the number of bytes written.
+        """
+        buf = DeferringBuffer(BINCOPY_HEADER, self.large_value_size)
+        encode_into = self.encoder.encode_deferred
+        size = 0
         for record in data:
-            fmt = [">h"]
-            rdat = [count]
-            for formatter, val in zip(self.formatters, record):
-                f, d = formatter(val)
-                fmt.append(f)
-                rdat.extend(d)
-            datastream.write(struct.pack("".join(fmt), *rdat))
+            encode_into(record, buf)
+            if buf.total() >= block_size:
+                size += buf.write_to(datastream)
+        buf += BINCOPY_TRAILER
+        return size + buf.write_to(datastream)
+
+    def writeblocks(self, blocks, datastream):
+        "Write blocks of already encoded tuples to a file-like object."
+        datastream.write(BINCOPY_HEADER)
+        size = len(BINCOPY_HEADER) + len(BINCOPY_TRAILER)
+        for block in blocks:
+            size += len(block)
+            datastream.write(block)
         datastream.write(BINCOPY_TRAILER)
+        return size
@@ -13,3 +13,7 @@ else:
 
 class UnsupportedConnectionError(TypeError):
     "connection type not supported"
+
+
+class CopyAborted(Exception):
+    "copy aborted because of an error in the data source"
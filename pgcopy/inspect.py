@@ -1,29 +1,114 @@
 "inspect column types"
 
+import collections
+
+Attribute = collections.namedtuple(
+    "Attribute", "attname type_category type_name type_mod not_null typelem"
+)
+
+
+# for arrays:
+# typname has '_' prefix
+# attndims > 0
+# typcategory is 'A'
+# typelem is typid of individual elem (otherwise zero)
+types_query = """
+        SELECT
+                a.attname,
+                t.typcategory::text AS type_category,
+                COALESCE(et.typname, t.typname) AS type_name,
+                a.atttypmod AS type_mod,
+                a.attnotnull AS not_null,
+                t.typelem
+        FROM
+                pg_catalog.pg_class c
+                JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+                JOIN pg_catalog.pg_type t ON a.atttypid = t.oid
+                LEFT JOIN pg_catalog.pg_type et ON t.typelem = et.oid
+                LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s and relname = %s and attnum > 0
+        ORDER BY c.relname, a.attnum;
+        """
+
 
 def get_types(backend, schema, table):
-    # for arrays:
-    # typname has '_' prefix
-    # attndims > 0
-    # typcategory is 'A'
-    # typelem is typid of individual elem (otherwise zero)
+    cursor = backend.namedtuple_cursor()
+    cursor.execute(types_query, (schema, table))
+    return {r.attname: Attribute._make(r) for r in cursor}
+
+
+async def get_types_async(backend, schema, table):
+    rows = await backend.fetch(types_query, (schema, table))
+    return {r.attname: Attribute._make(r) for r in rows}
+
+
+types_many_query = """
+        SELECT
+                x.ord,
+                a.attname,
+                t.typcategory::text AS type_category,
+                COALESCE(et.typname, t.typname) AS type_name,
+                a.atttypmod AS type_mod,
+                a.attnotnull AS not_null,
+                t.typelem
+        FROM
+                unnest(%s::text[], %s::text[]) WITH ORDINALITY AS x(nspname, relname, ord)
+                JOIN pg_catalog.pg_namespace n ON n.nspname = x.nspname
+                JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid
+                    AND c.relname = x.relname
+                JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+                JOIN pg_catalog.pg_type t ON a.atttypid = t.oid
+                LEFT JOIN pg_catalog.pg_type et ON t.typelem = et.oid
+        WHERE attnum > 0
+        ORDER BY x.ord, a.attnum;
+        """
+
+
+def types_many(tables, rows):
+    result = {table: {} for table in tables}
+    for r in rows:
+        result[tables[r[0] - 1]][r[1]] = Attribute._make(r[1:])
+    return result
+
+
+def get_types_many(backend, tables):
+    """
+    Column types of many tables, from a single catalog query.
+
+    :param tables: tables to inspect
+    :type tables: iterable of (schema, table) pairs
+
+    Returns a dict mapping each (schema, table) pair to a dict of column
+    :class:`Attribute` by column name, as returned by :func:`get_types`;
+    the dict is empty if the table does not exist.
+    """
+    tables = [tuple(t) for t in tables]
+    params = ([s for s, _ in tables], [t for _, t in tables])
+    cursor = backend.namedtuple_cursor()
+    cursor.execute(types_many_query, params)
+    return types_many(tables, cursor)
+
+
+async def get_types_many_async(backend, tables):
+    tables = [tuple(t) for t in tables]
+    params = ([s for s, _ in tables], [t for _, t in tables])
+    rows = await backend.fetch(types_many_query, params)
+    return types_many(tables, rows)
+
+
+def get_ddl_stamp(backend, schema, table):
+    "values in the catalog which change when the table is altered"
     query = """
-            SELECT
-                    a.attname,
-                    t.typcategory AS type_category,
-                    COALESCE(et.typname, t.typname) AS type_name,
-                    a.atttypmod AS type_mod,
-                    a.attnotnull AS not_null,
-                    t.typelem
-            FROM
-                    pg_catalog.pg_class c
-                    JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
-                    JOIN pg_catalog.pg_type t ON a.atttypid = t.oid
-                    LEFT JOIN pg_catalog.pg_type et ON t.typelem = et.oid
-                    LEFT JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
-            WHERE n.nspname = %s and relname = %s and attnum > 0
-            ORDER BY c.relname, a.attnum;
+            SELECT c.oid::bigint, c.relfilenode::bigint, c.xmin::text,
+                (SELECT string_agg(a.attname || ':' || a.atttypid::text
+                        || ':' || a.atttypmod::text, ',' ORDER BY a.attnum)
+                    FROM pg_catalog.pg_attribute a
+                    WHERE a.attrelid = c.oid AND a.attnum > 0
+                        AND NOT a.attisdropped)
+            FROM pg_catalog.pg_class c
+            JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s and c.relname = %s
             """
     cursor = backend.namedtuple_cursor()
     cursor.execute(query, (schema, table))
-    return {r.attname: r for r in cursor}
+    return tuple(map(tuple, cursor))
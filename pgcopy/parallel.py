@@ -0,0 +1,196 @@
+"bulk-loading over several connections at once"
+
+import collections
+import itertools
+import queue
+import threading
+
+from .copy import BLOCK_SIZE, CopyManager
+from .errors import CopyAborted
+from .thread import RaisingThread
+
+CopyStats = collections.namedtuple("CopyStats", "rows bytes")
+
+ABORT = object()
+
+
+class ParallelCopyManager(object):
+    """
+    Facility for bulk-loading data into one table using several
+    connections in parallel.
+
+    PostgreSQL processes each ``COPY`` in a single backend process,
+    so one connection is limited to roughly one server core.  This
+    opens ``workers`` connections, each with its own
+    :class:`pgcopy.CopyManager`, and divides the data among them.
+
+    :param connect: a function returning a new database connection
+    :type connect: function
+
+    :param table: the table name.  Schema may be specified using dot notation: ``schema.table``.
+    :type table: str
+
+    :param cols: columns in the table into which to copy data
+    :type cols: iterable of str
+
+    :param workers: number of connections
+    :type workers: int
+
+    :param manager_class: copy manager class used for each connection
+    :type manager_class: class
+
+    Since each connection commits its own part of the data, a load
+    which fails may be partially committed.  The table must be visible
+    to every connection, so it cannot be a temporary table.
+    """
+
+    def __init__(self, connect, table, cols, workers=4, manager_class=CopyManager):
+        self.connections = [connect() for _ in range(workers)]
+        self.managers = [manager_class(c, table, cols) for c in self.connections]
+        self.stats = []
+        self.failed = threading.Event()
+
+    def copy(
+        self,
+        data,
+        key=None,
+        rows_per_chunk=1000,
+        commit=True,
+        block_size=BLOCK_SIZE,
+    ):
+        """
+        Copy data into the database over all connections.
+
+        :param data: the data to be inserted
+        :type data: iterable of iterables
+
+        :param key: a function of a record; records with equal keys are
+            sent over the same connection.  By default, chunks of records
+            are distributed round-robin.
+        :type key: function
+
+        :param rows_per_chunk: number of records passed to a worker at a time
+        :type rows_per_chunk: int
+
+        :param commit: commit each connection when its copy is done
+        :type commit: bool
+
+        :param block_size: size in bytes of blocks sent to the database
+        :type block_size: int
+
+        Returns a list of :class:`CopyStats` with the number of rows and
+        bytes copied by each worker, which is also kept as :attr:`stats`.
+
+        If a worker fails, or reading the data fails, no more data is
+        read, the other workers are aborted, and every connection is
+        rolled back once all of them have stopped.  Then the first error
+        is raised.
+        """
+        queues = [queue.Queue(maxsize=2) for _ in self.managers]
+        self.stats = [CopyStats(0, 0)] * len(self.managers)
+        self.failed.clear()
+        threads = [
+            RaisingThread(target=self.work, args=(i, q, commit, block_size))
+            for i, q in enumerate(queues)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            if key is None:
+                self.round_robin(data, queues, rows_per_chunk)
+            else:
+                self.partition(data, queues, key, rows_per_chunk)
+        except BaseException:
+            for q in queues:
+                q.put(ABORT)
+            join(threads)
+            # an aborted copy may have ended cleanly with the rows sent
+            self.rollback()
+            raise
+        end = ABORT if self.failed.is_set() else None
+        for q in queues:
+            q.put(end)
+        errors = join(threads)
+        if errors:
+            self.rollback()
+            # the error of the failed worker, rather than of those aborted
+            errors.sort(key=lambda e: isinstance(e, CopyAborted))
+            raise errors[0]
+        return self.stats
+
+    def round_robin(self, data, queues, rows_per_chunk):
+        it = iter(data)
+        for q in itertools.cycle(queues):
+            chunk = list(itertools.islice(it, rows_per_chunk))
+            if not chunk or self.failed.is_set():
+                return
+            q.put(chunk)
+
+    def partition(self, data, queues, key, rows_per_chunk):
+        chunks = [[] for _ in queues]
+        for record in data:
+            i = hash(key(record)) % len(queues)
+            chunks[i].append(record)
+            if len(chunks[i]) >= rows_per_chunk:
+                if self.failed.is_set():
+                    return
+                queues[i].put(chunks[i])
+                chunks[i] = []
+        for q, chunk in zip(queues, chunks):
+            if chunk and not self.failed.is_set():
+                q.put(chunk)
+
+    def work(self, i, q, commit, block_size):
+        mgr = self.managers[i]
+        rows = 0
+        done = False
+
+        def records():
+            nonlocal rows, done
+            while True:
+                chunk = q.get()
+                if chunk is None or chunk is ABORT:
+                    done = True
+                    if chunk is ABORT:
+                        raise CopyAborted("copy aborted")
+                    return
+                rows += len(chunk)
+                for record in chunk:
+                    yield record
+
+        try:
+            size = mgr.threading_copy(records(), block_size=block_size)
+            if commit:
+                mgr.backend.conn.commit()
+            self.stats[i] = CopyStats(rows, size)
+        except BaseException:
+            self.failed.set()
+            raise
+        finally:
+            # keep draining so the producer never blocks on a dead worker
+            while not done:
+                chunk = q.get()
+                done = chunk is None or chunk is ABORT
+
+    def commit(self):
+        for conn in self.connections:
+            conn.commit()
+
+    def rollback(self):
+        for conn in self.connections:
+            conn.rollback()
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+
+
+def join(threads):
+    "join every thread, returning the errors they raised"
+    errors = []
+    for thread in threads:
+        try:
+            thread.join()
+        except Exception as e:
+            errors.append(e)
+    return errors
@@ -0,0 +1,56 @@
+"encoding in a pool of worker processes"
+
+import collections
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+encoder = None
+
+
+def initialize(row_encoder):
+    "set the row encoder in a worker process"
+    global encoder
+    encoder = row_encoder
+
+
+def encode_records(records):
+    buf = bytearray()
+    encode_into = encoder.encode_into
+    for record in records:
+        encode_into(record, buf)
+    return buf
+
+
+def chunks(data, rows_per_chunk):
+    it = iter(data)
+    while True:
+        chunk = list(itertools.islice(it, rows_per_chunk))
+        if not chunk:
+            return
+        yield chunk
+
+
+def encoded_blocks(row_encoder, data, processes, rows_per_chunk, max_pending, ctx):
+    """
+    Generate encoded blocks of ``rows_per_chunk`` records, in order.
+
+    Chunks are encoded in a pool of worker processes, with at most
+    ``max_pending`` chunks submitted and not yet consumed.
+    """
+    processes = processes or os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * processes
+    executor = ProcessPoolExecutor(
+        processes, ctx, initializer=initialize, initargs=(row_encoder,)
+    )
+    pending = collections.deque()
+    try:
+        for chunk in chunks(data, rows_per_chunk):
+            pending.append(executor.submit(encode_records, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
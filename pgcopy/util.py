@@ -31,18 +31,41 @@ def array_iter(arr):
             yield i
 
 
+schema_query = """
+    SELECT n.nspname, c.relname
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = %s::regclass
+    """
+
+
 def get_schema(conn, table):
     cur = conn.cursor()
-    query = """
-        SELECT n.nspname, c.relname
-        FROM pg_catalog.pg_class c
-        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
-        WHERE c.oid = %s::regclass
-        """
-    cur.execute(query, (f'"{table}"',))
+    cur.execute(schema_query, (f'"{table}"',))
     return cur.fetchone()[0]
 
 
+schemas_query = """
+    SELECT n.nspname
+    FROM unnest(%s::text[]) WITH ORDINALITY AS x(relname, ord)
+    JOIN pg_catalog.pg_class c ON c.oid = x.relname::regclass
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    ORDER BY x.ord
+    """
+
+
+def get_schemas(conn, tables):
+    "schemas of many tables, as found by the search path"
+    cur = conn.cursor()
+    cur.execute(schemas_query, ([f'"{table}"' for table in tables],))
+    return [row[0] for row in cur.fetchall()]
+
+
+async def get_schema_async(backend, table):
+    rows = await backend.fetch(schema_query, (f'"{table}"',))
+    return rows[0][0]
+
+
 def to_utc(dt):
     if not isinstance(dt, datetime):
         dt = datetime(dt.year, dt.month, dt.day)
@@ -54,6 +54,8 @@ class Psycopg2(Adaptor):
             self.m.psycopg2.errors.FeatureNotSupported,
         )
         self.integrity_error = self.m.psycopg2.errors.IntegrityError
+        self.copy_data_error = self.m.psycopg2.DataError
+        self.copy_integrity_error = self.integrity_error
 
     @staticmethod
     def supports_encoding(encoding):
@@ -72,6 +74,8 @@ class Psycopg3(Adaptor):
             self.m.psycopg.errors.FeatureNotSupported,
         )
         self.integrity_error = self.m.psycopg.errors.IntegrityError
+        self.copy_data_error = self.m.psycopg.DataError
+        self.copy_integrity_error = self.integrity_error
 
     @staticmethod
     def supports_encoding(encoding):
@@ -90,6 +94,9 @@ class PyGreSQL(Adaptor):
             self.conn.NotSupportedError,
         )
         self.integrity_error = self.conn.IntegrityError
+        # copy_from raises OSError for errors reported by the server
+        self.copy_data_error = OSError
+        self.copy_integrity_error = OSError
 
     @staticmethod
     def supports_encoding(encoding):
@@ -111,6 +118,8 @@ class Pg8000(Adaptor):
             cur.execute(f"SET client_encoding='{client_encoding}'")
         self.unsupported_type = self.m.exceptions.DatabaseError
         self.integrity_error = self.m.exceptions.DatabaseError
+        self.copy_data_error = self.m.exceptions.DatabaseError
+        self.copy_integrity_error = self.m.exceptions.DatabaseError
 
     def get_connection_parameters(self, connection_params):
         with db_connection.conninfo(connection_params) as conninfo:
@@ -85,6 +85,16 @@ def integrity_error(adaptor):
     return adaptor.integrity_error
 
 
+@pytest.fixture
+def copy_data_error(adaptor):
+    return adaptor.copy_data_error
+
+
+@pytest.fixture
+def copy_integrity_error(adaptor):
+    return adaptor.copy_integrity_error
+
+
 @pytest.fixture
 def cursor(conn):
     cur = conn.cursor()
@@ -1,6 +1,10 @@
+from datetime import datetime
+
 import pytest
+from pgcopy import CopyManager, copy, util
+from pgcopy.inspect import Attribute
 
-from pgcopy import util
+from . import db
 
 
 @pytest.mark.parametrize(
@@ -31,3 +35,95 @@ def test_bad_array():
 )
 def test_flatten(arr, flat):
     assert list(util.array_iter(arr)) == flat
+
+
+def float8_array():
+    att = Attribute("a", "A", "float8", -1, False, 701)
+    return copy.array(att, "utf8", copy.type_formatters["float8"])
+
+
+@pytest.mark.parametrize(
+    "arr", [[], [1.5, 2], (1.5, -2.25), [1.5, None], [[1.5], [2.0]], {1.5}]
+)
+def test_fixed_array(arr):
+    generic = copy.array_formatter(701, copy.type_formatters["float8"], arr)
+    assert float8_array()(arr) == generic
+
+
+def test_ndarray():
+    np = pytest.importorskip("numpy")
+    arr = [[1.5, 2.0, 3.0], [4.0, 5.0, 6.5]]
+    generic = copy.array_formatter(701, copy.type_formatters["float8"], arr)
+    assert float8_array()(np.array(arr)) == generic
+    assert float8_array()(np.array(arr, dtype=">f4")) == generic
+    assert float8_array()(np.array(arr).T.T) == generic
+    with pytest.raises(ValueError, match="is not an array type"):
+        float8_array()(np.float64(1.5))
+
+
+class TestFixedArrays(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["double precision[]", "integer[]", "timestamp[]"]
+
+    def select(self, cursor, schema_table):
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY id'
+        cursor.execute(sql.format(self.select_list, *schema_table.split(".")))
+        return [tuple(row[1:]) for row in cursor.fetchall()]
+
+    def test_lists(self, conn, cursor, schema_table):
+        ts = datetime(2020, 1, 2, 3, 4, 5, 6)
+        records = [
+            (0, [1.5, 2.5], [1, 2, 3], [ts]),
+            (1, (0.5,), [[1, 2], [3, 4]], [ts, None]),
+            (2, [None], [], None),
+        ]
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy(records)
+        assert self.select(cursor, schema_table) == [
+            ([1.5, 2.5], [1, 2, 3], [ts]),
+            ([0.5], [[1, 2], [3, 4]], [ts, None]),
+            ([None], [], None),
+        ]
+
+    def test_ndarray(self, conn, cursor, schema_table):
+        np = pytest.importorskip("numpy")
+        records = [
+            (
+                0,
+                np.linspace(0, 1, 5),
+                np.arange(6, dtype="i2").reshape(2, 3),
+                np.array(["2020-01-02T03:04:05.000006"], dtype="datetime64[us]"),
+            ),
+            (
+                1,
+                np.empty(0),
+                np.array([1, 2]),
+                np.array(["2020-01-02", "NaT"], dtype="datetime64[D]"),
+            ),
+        ]
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy(records)
+        assert self.select(cursor, schema_table) == [
+            (
+                [0, 0.25, 0.5, 0.75, 1],
+                [[0, 1, 2], [3, 4, 5]],
+                [datetime(2020, 1, 2, 3, 4, 5, 6)],
+            ),
+            ([], [1, 2], [datetime(2020, 1, 2), None]),
+        ]
+
+    def test_ndarray_nat_ns(self, conn, cursor, schema_table):
+        np = pytest.importorskip("numpy")
+        timestamps = ["2020-01-02T03:04:05.000006789", "NaT"]
+        records = [(0, None, None, np.array(timestamps, dtype="datetime64[ns]"))]
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy(records)
+        expected = [datetime(2020, 1, 2, 3, 4, 5, 6), None]
+        assert self.select(cursor, schema_table) == [(None, None, expected)]
+
+    def test_ndarray_out_of_range(self, conn, schema_table):
+        np = pytest.importorskip("numpy")
+        mgr = CopyManager(conn, schema_table, self.cols[:3])
+        message = "error formatting value .* for column {}".format(self.cols[2])
+        with pytest.raises(ValueError, match=message):
+            mgr.copy([(0, np.ones(2), np.array([2**40]))])
@@ -0,0 +1,114 @@
+import decimal
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+from pgcopy import CopyManager
+
+from . import db
+
+pa = pytest.importorskip("pyarrow")
+
+
+class TestCopyArrow(db.TemporaryTable):
+    null = "NULL"
+    datatypes = [
+        "integer",
+        "double precision",
+        "bool",
+        "varchar(5)",
+        "bytea",
+        "date",
+        "timestamp with time zone",
+        "numeric",
+    ]
+
+    def arrow_table(self):
+        return pa.table(
+            {
+                "id": pa.array([0, 1, 2, 3], pa.int64()),
+                "COL_a": pa.array([1, None, 3, 4], pa.int64()),
+                "COL_b": pa.array([1.5, 2.5, None, 4.5], pa.float32()),
+                "COL_c": pa.array([True, None, False, True]),
+                "COL_d": pa.array(["one", "two", None, "fourty"]),
+                "COL_e": pa.array([b"\x00", None, b"", b"xyz"], pa.large_binary()),
+                "COL_f": pa.array([date(2001, 2, 3), None, date(1999, 1, 1), None]),
+                "COL_g": pa.array(
+                    [datetime(2020, 1, 1, 12), None, None, datetime(1970, 1, 1)],
+                    pa.timestamp("ms", tz="US/Eastern"),
+                ),
+                "COL_h": pa.array(
+                    [decimal.Decimal("1.5"), None, decimal.Decimal("-2"), None]
+                ),
+            }
+        )
+
+    expected_rows = [
+        (
+            0,
+            1,
+            1.5,
+            True,
+            "one",
+            b"\x00",
+            date(2001, 2, 3),
+            datetime(2020, 1, 1, 12),
+            decimal.Decimal("1.5"),
+        ),
+        (1, None, 2.5, None, "two", None, None, None, None),
+        (2, 3, None, False, None, b"", date(1999, 1, 1), None, decimal.Decimal("-2")),
+        (3, 4, 4.5, True, "fourt", b"xyz", None, datetime(1970, 1, 1), None),
+    ]
+
+    def check(self, cursor, schema_table):
+        schema, table = schema_table.split(".")
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(self.select_list, schema, table))
+        for expected, found in zip(self.expected_rows, cursor.fetchall()):
+            found = [bytes(v) if isinstance(v, memoryview) else v for v in found]
+            if found[7] is not None:
+                found[7] = found[7].astimezone(timezone.utc).replace(tzinfo=None)
+            assert list(expected) == found
+
+    def test_table(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy_arrow(self.arrow_table(), rows_per_chunk=3)
+        self.check(cursor, schema_table)
+
+    def test_reader(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        table = self.arrow_table().slice(1)
+        reader = pa.RecordBatchReader.from_batches(table.schema, table.to_batches())
+        mgr.copy_arrow(self.arrow_table().slice(0, 1))
+        mgr.copy_arrow(reader)
+        self.check(cursor, schema_table)
+
+
+class TestCopyArrowNonText(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["uuid", "uuid", "jsonb"]
+    guids = [uuid.UUID(int=i * 0x1234567890ABCDEF) for i in range(1, 4)]
+
+    def test_table(self, conn, cursor, schema_table):
+        table = pa.table(
+            {
+                "id": pa.array([0, 1, 2], pa.int64()),
+                "COL_a": pa.array([str(self.guids[0]), None, str(self.guids[2])]),
+                "COL_b": pa.array([g.bytes for g in self.guids], pa.binary()),
+                "COL_c": pa.array([b"1", b'"x"', None], pa.large_binary()),
+            }
+        )
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy_arrow(table)
+        schema, table = schema_table.split(".")
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(self.select_list, schema, table))
+        found = [[str(v) if v is not None else v for v in row[1:3]] for row in cursor]
+        assert found == [
+            [str(self.guids[0]), str(self.guids[0])],
+            [None, str(self.guids[1])],
+            [str(self.guids[2]), str(self.guids[2])],
+        ]
+        sql = 'SELECT "COL_c"::text FROM "{}"."{}" ORDER BY id'
+        cursor.execute(sql.format(schema, table))
+        assert [row[0] for row in cursor.fetchall()] == ["1", '"x"', None]
@@ -0,0 +1,133 @@
+import asyncio
+import decimal
+
+import pytest
+from pgcopy import AsyncCopyManager, CopyManager, inspect
+from pgcopy.errors import UnsupportedConnectionError
+
+from . import db, db_connection
+
+
+class AsyncSession:
+    "temporary table in a transaction on an asynchronous connection"
+
+    def __init__(self, driver, table):
+        self.driver = driver
+        self.table = table
+
+    async def __aenter__(self):
+        params = db_connection.connection_params
+        if self.driver.__name__ == "psycopg":
+            self.conn = await self.driver.AsyncConnection.connect(**params)
+        else:
+            kw = {"database": params["dbname"], "host": params["host"]}
+            kw.update((k, params[k]) for k in ("port", "user", "password"))
+            self.conn = await self.driver.connect(**kw)
+            self.transaction = self.conn.transaction()
+            await self.transaction.start()
+        await self.execute(self.table.create_sql(True))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.driver.__name__ == "psycopg":
+            await self.conn.rollback()
+        else:
+            await self.transaction.rollback()
+        await self.conn.close()
+
+    async def execute(self, sql):
+        await self.conn.execute(sql)
+
+    async def count(self):
+        sql = 'SELECT count(*), sum("id") FROM "%s"' % self.table.table
+        if self.driver.__name__ == "psycopg":
+            cur = await self.conn.execute(sql)
+            return tuple(await cur.fetchone())
+        return tuple(await self.conn.fetchrow(sql))
+
+
+@pytest.fixture(params=["psycopg", "asyncpg"])
+def driver(request, db):
+    return pytest.importorskip(request.param)
+
+
+class TestAsyncCopy(db.TemporaryTable):
+    datatypes = ["integer", "varchar(12)", "timestamp with time zone"]
+    record_count = 200
+
+    def run(self, driver, load):
+        async def main():
+            async with AsyncSession(driver, self) as session:
+                await load(session.conn)
+                return await session.count()
+
+        return asyncio.run(main())
+
+    def test_copy(self, driver, data):
+        async def load(conn):
+            mgr = AsyncCopyManager(conn, self.table, self.cols)
+            size = await mgr.copy(data, block_size=100)
+            assert size > 100
+
+        assert self.run(driver, load) == (200, sum(range(200)))
+
+    def test_async_iterable(self, driver, data):
+        async def records():
+            for record in data:
+                await asyncio.sleep(0)
+                yield record
+
+        async def load(conn):
+            mgr = AsyncCopyManager(conn, self.table, self.cols)
+            await mgr.compile()
+            await mgr.copy(records())
+
+        assert self.run(driver, load) == (200, sum(range(200)))
+
+    def test_bad_column(self, driver):
+        async def load(conn):
+            mgr = AsyncCopyManager(conn, self.table, ["id", "missing"])
+            await mgr.compile()
+
+        with pytest.raises(ValueError, match="missing"):
+            self.run(driver, load)
+
+    def test_get_types_many(self, driver):
+        async def load(conn):
+            mgr = AsyncCopyManager(conn, self.table, self.cols)
+            await mgr.compile()
+            tables = [(mgr.schema, mgr.table), ("public", "missing")]
+            types = await inspect.get_types_many_async(mgr.backend, tables)
+            assert [att.attname for att in mgr.encoder.atts] == list(types[tables[0]])
+            assert types[tables[1]] == {}
+
+        self.run(driver, load)
+
+    def test_sync_manager(self, driver):
+        async def load(conn):
+            CopyManager(conn, self.table, self.cols)
+
+        with pytest.raises(UnsupportedConnectionError):
+            self.run(driver, load)
+
+    def test_sync_only_methods(self, driver):
+        async def load(conn):
+            mgr = AsyncCopyManager(conn, self.table, self.cols)
+            for name in ["copy_arrays", "copy_chunked", "write_file"]:
+                with pytest.raises(TypeError, match=name):
+                    getattr(mgr, name)([])
+            with pytest.raises(TypeError, match="for_tables"):
+                AsyncCopyManager.for_tables(conn, {self.table: self.cols})
+
+        self.run(driver, load)
+
+
+def test_async_manager_sync_connection(conn):
+    message = "is not an asynchronous connection"
+    with pytest.raises(UnsupportedConnectionError, match=message):
+        AsyncCopyManager(conn, "fake_table", ["id"])
+
+
+class TestAsyncCopyTypes(TestAsyncCopy):
+    datatypes = ["numeric", "integer[]", "varchar(12)"]
+    data = [(decimal.Decimal(i) / 4, [i, i + 1], "%d" % i) for i in range(200)]
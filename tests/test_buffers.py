@@ -0,0 +1,95 @@
+import importlib
+import os
+
+import pytest
+from pgcopy import CopyManager, buffers
+
+from . import db
+
+
+def installed(module):
+    try:
+        importlib.import_module(module)
+        return True
+    except ImportError:
+        return False
+
+
+codecs = [
+    "zlib",
+    "lzma",
+    pytest.param("lz4", marks=pytest.mark.skipif(not installed("lz4"), reason="lz4")),
+    pytest.param(
+        "zstd", marks=pytest.mark.skipif(not installed("zstandard"), reason="zstd")
+    ),
+]
+
+strategies = [
+    buffers.TemporaryFile(),
+    buffers.Spooled(max_size=100, read_size=64),
+    buffers.Memfd(read_size=100),
+    buffers.Mmap(),
+    buffers.Mmap(read_size=7),
+    buffers.Compressed("zlib", read_size=100),
+]
+
+
+class TestBuffers(db.TemporaryTable):
+    datatypes = ["integer", "varchar(12)"]
+    record_count = 50
+
+    @pytest.mark.parametrize("strategy", strategies)
+    def test_copy(self, conn, cursor, schema_table, data, strategy):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy(data, strategy, block_size=100)
+        sql = 'SELECT count(*), sum("id") FROM "{}"."{}"'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        assert tuple(cursor.fetchone()) == (50, sum(range(50)))
+
+
+def test_mmap_file():
+    f = buffers.Mmap()()
+    f.write(b"0123456789")
+    f.seek(0)
+    assert [f.read(4), f.read(4), f.read(4), f.read(4)] == [
+        b"0123",
+        b"4567",
+        b"89",
+        b"",
+    ]
+    f.seek(0)
+    assert f.read() == b"0123456789"
+    f.close()
+
+
+def test_mmap_file_empty():
+    f = buffers.Mmap()()
+    f.seek(0)
+    assert f.read(10) == b""
+    f.close()
+
+
+@pytest.mark.parametrize("codec", codecs)
+def test_compressed_file(codec):
+    data = b"".join(b"\x00\x01\x00\x00\x00\x04%04d" % (i % 100) for i in range(10000))
+    f = buffers.Compressed(codec)()
+    for i in range(0, len(data), 1000):
+        f.write(bytearray(data[i : i + 1000]))
+    f.seek(0)
+    assert os.fstat(f.file.fileno()).st_size < len(data) / 2
+    chunks = list(iter(lambda: f.read(4096), b""))
+    assert all(len(chunk) == 4096 for chunk in chunks[:-1])
+    assert b"".join(chunks) == data
+    f.seek(0)
+    assert f.read() == data
+    f.close()
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError, match="unknown codec"):
+        buffers.Compressed("rot13")
+
+
+def test_abstract_buffer():
+    with pytest.raises(TypeError):
+        buffers.Buffer()
@@ -0,0 +1,119 @@
+import pytest
+from pgcopy import CopyManager, backend
+from pgcopy.cache import PlanCache
+
+from . import db
+
+
+def cached_manager_class(**kwargs):
+    class CachedCopyManager(CopyManager):
+        plan_cache = PlanCache(**kwargs)
+
+    return CachedCopyManager
+
+
+class TestPlanCache(db.TemporaryTable):
+    datatypes = ["integer", "varchar(12)"]
+
+    def count(self, cursor, schema_table):
+        sql = 'SELECT count(*) FROM "{}"."{}"'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        return cursor.fetchone()[0]
+
+    def test_hit(self, conn, cursor, schema_table, data):
+        cls = cached_manager_class()
+        mgr = cls(conn, schema_table, self.cols)
+        other = cls(conn, schema_table, self.cols)
+        assert other.encoder is mgr.encoder
+        assert (cls.plan_cache.hits, cls.plan_cache.misses) == (1, 1)
+        other.copy(data)
+        assert self.count(cursor, schema_table) == len(data)
+
+    def test_columns(self, conn, schema_table):
+        cls = cached_manager_class()
+        mgr = cls(conn, schema_table, self.cols)
+        other = cls(conn, schema_table, self.cols[:1])
+        assert other.encoder is not mgr.encoder
+        assert len(cls.plan_cache) == 2
+
+    def test_unqualified(self, conn, schema_table):
+        cls = cached_manager_class()
+        schema, table = schema_table.split(".")
+        cls(conn, table, self.cols)
+        mgr = cls(conn, table, self.cols)
+        assert mgr.schema == schema
+        assert cls.plan_cache.hits == 1
+
+    def test_invalidate(self, conn, schema_table):
+        cls = cached_manager_class()
+        mgr = cls(conn, schema_table, self.cols)
+        cls.plan_cache.invalidate(table="other")
+        assert cls(conn, schema_table, self.cols).encoder is mgr.encoder
+        cls.plan_cache.invalidate(table=mgr.table, schema=mgr.schema)
+        assert cls(conn, schema_table, self.cols).encoder is not mgr.encoder
+        cls.plan_cache.clear()
+        assert len(cls.plan_cache) == 0
+
+    def test_ttl(self, conn, schema_table):
+        cls = cached_manager_class(ttl=0)
+        mgr = cls(conn, schema_table, self.cols)
+        assert cls(conn, schema_table, self.cols).encoder is not mgr.encoder
+
+    def test_maxsize(self, conn, schema_table):
+        cls = cached_manager_class(maxsize=1)
+        cls(conn, schema_table, self.cols)
+        cls(conn, schema_table, self.cols[:1])
+        assert len(cls.plan_cache) == 1
+
+    def test_check_ddl(self, conn, cursor, schema_table):
+        cls = cached_manager_class(check_ddl=True)
+        mgr = cls(conn, schema_table, self.cols)
+        assert cls(conn, schema_table, self.cols).encoder is mgr.encoder
+        sql = 'ALTER TABLE "{}"."{}" ALTER COLUMN "COL_b" TYPE text'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        other = cls(conn, schema_table, self.cols)
+        assert other.encoder is not mgr.encoder
+        assert other.encoder.atts[2].type_name == "text"
+
+
+def test_search_path(conn, cursor):
+    cls = cached_manager_class()
+    schemas = ["pgcopy_path_a", "pgcopy_path_b"]
+    for schema in schemas:
+        cursor.execute('CREATE SCHEMA "{}"'.format(schema))
+        cursor.execute('CREATE TABLE "{}".t (a integer)'.format(schema))
+    for schema in schemas:
+        cursor.execute('SET search_path = "{}"'.format(schema))
+        mgr = cls(conn, "t", ["a"])
+        assert mgr.schema == schema
+        mgr.copy([(1,)])
+    for schema in schemas:
+        cursor.execute('SELECT count(*) FROM "{}".t'.format(schema))
+        assert cursor.fetchone()[0] == 1
+    assert len(cls.plan_cache) == 2
+
+
+class ConnectionProxy(object):
+    "wrapped connection, without the adaptor's private attributes"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return self.conn.cursor()
+
+
+def test_pygresql_without_cnx(conn):
+    if not isinstance(backend.for_connection(conn), backend.PyGreSQLBackend):
+        pytest.skip("PyGreSQL only")
+    proxied = backend.PyGreSQLBackend(ConnectionProxy(conn))
+    assert proxied.get_encoding() == backend.for_connection(conn).get_encoding()
+    assert len(proxied.identity()) == 4
+
+
+def test_pg8000_identity(conn):
+    if not isinstance(backend.for_connection(conn), backend.Pg8000Backend):
+        pytest.skip("pg8000 only")
+    identity = backend.for_connection(conn).identity()
+    assert backend.identities[conn] == identity
+    assert not hasattr(conn, "_pgcopy_identity")
@@ -0,0 +1,39 @@
+import pytest
+from pgcopy import CopyManager
+from pgcopy.copy import Checkpoint
+
+from . import db
+
+
+class TestCopyChunked(db.TemporaryTable):
+    datatypes = ["integer", "varchar(12)"]
+    record_count = 25
+
+    def count(self, cursor, schema_table):
+        sql = 'SELECT count(*), sum("id") FROM "{}"."{}"'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        return tuple(cursor.fetchone())
+
+    def test_checkpoints(self, conn, cursor, schema_table, data):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        checkpoints = []
+        last = mgr.copy_chunked(data, 10, checkpoint=checkpoints.append)
+        assert checkpoints == [(10, 10), (20, 20), (25, 25)]
+        assert last == Checkpoint(25, 25)
+        assert self.count(cursor, schema_table) == (25, sum(range(25)))
+
+    def test_resume(self, conn, cursor, schema_table, data):
+        def records():
+            yield from data[:15]
+            raise ZeroDivisionError()
+
+        mgr = CopyManager(conn, schema_table, self.cols)
+        checkpoints = []
+        with pytest.raises(ZeroDivisionError):
+            mgr.copy_chunked(records(), 10, checkpoint=checkpoints.append)
+        assert checkpoints == [(10, 10)]
+        conn.rollback()
+        assert self.count(cursor, schema_table) == (10, sum(range(10)))
+        last = mgr.copy_chunked(iter(data), 10, start=checkpoints[-1].offset)
+        assert last == Checkpoint(15, 25)
+        assert self.count(cursor, schema_table) == (25, sum(range(25)))
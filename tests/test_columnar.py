@@ -0,0 +1,210 @@
+import decimal
+import io
+import uuid
+from datetime import date, datetime, time
+
+import pytest
+from pgcopy import CopyManager
+
+from . import db
+
+np = pytest.importorskip("numpy")
+
+
+def test_null_mask_masked_array():
+    from pgcopy.columnar import null_mask
+
+    values = np.ma.array([1, 2, 3], mask=[False, False, True])
+    mask = null_mask(values, [True, False, False])
+    assert mask.tolist() == [True, False, True]
+
+
+def test_null_mask_2d_masked_array():
+    from pgcopy.columnar import null_mask
+
+    values = np.ma.array(np.ones((3, 2)), mask=[[0, 0], [1, 1], [0, 1]])
+    mask = null_mask(values, [True, False, False])
+    assert mask.tolist() == [True, True, False]
+
+
+class TestCopyArrays(db.TemporaryTable):
+    id_col = False
+    null = "NULL"
+    datatypes = [
+        "integer",
+        "bigint",
+        "double precision",
+        "bool",
+        "date",
+        "time",
+        "timestamp",
+        "timestamp with time zone",
+    ]
+    columns = [
+        np.array([1, 2, 3]),
+        np.array([2**40, -5, 0]),
+        np.array([1.5, -2.25, 0]),
+        np.array([True, False, True]),
+        np.array(["2001-02-03", "1999-12-31", "NaT"], dtype="datetime64[D]"),
+        np.array([3600, 1, 0], dtype="timedelta64[s]"),
+        np.array(["2001-02-03T04:05:06.789", "NaT", "1970-01-01"], "datetime64[ms]"),
+        np.array(["2020-01-01T12:00", "1900-01-01", "NaT"], dtype="datetime64[s]"),
+    ]
+    masks = [None, [False, True, False], None, [False, False, True]] + [None] * 4
+    expected_rows = [
+        (
+            1,
+            2**40,
+            1.5,
+            True,
+            date(2001, 2, 3),
+            time(1),
+            datetime(2001, 2, 3, 4, 5, 6, 789000),
+            datetime(2020, 1, 1, 12),
+        ),
+        (
+            2,
+            None,
+            -2.25,
+            False,
+            date(1999, 12, 31),
+            time(0, 0, 1),
+            None,
+            datetime(1900, 1, 1),
+        ),
+        (3, 0, 0, None, None, time(0), datetime(1970, 1, 1), None),
+    ]
+
+    def test_copy_arrays(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy_arrays(self.columns, self.masks, block_size=64)
+        cursor.execute("SET TIME ZONE 'UTC'")
+        schema, table = schema_table.split(".")
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(self.select_list, schema, table))
+        for expected, found in zip(self.expected_rows, cursor.fetchall()):
+            found = [
+                v.replace(tzinfo=None) if hasattr(v, "tzinfo") else v for v in found
+            ]
+            assert list(expected) == found
+
+    def test_matches_row_encoder(self, conn, schema_table):
+        from pgcopy import columnar
+
+        mgr = CopyManager(conn, schema_table, self.cols[:4])
+        encoder = columnar.ColumnarEncoder(
+            mgr.encoder, self.columns[:4], self.masks[:4]
+        )
+        rows = [row[:4] for row in self.expected_rows]
+        assert encoder.encode(0, 3) == b"".join(map(mgr.encoder.encode, rows))
+
+    def test_streamed(self, conn, schema_table, monkeypatch):
+        import tempfile
+
+        def no_file():
+            raise AssertionError("spooled to a temporary file")
+
+        monkeypatch.setattr(tempfile, "TemporaryFile", no_file)
+        mgr = CopyManager(conn, schema_table, self.cols)
+        size = mgr.copy_arrays(self.columns, self.masks, block_size=64)
+        spooled = mgr.copy_arrays(self.columns, self.masks, fobject_factory=io.BytesIO)
+        assert size == spooled
+
+    @pytest.mark.parametrize("i", range(4, 8))
+    def test_not_datetimes(self, conn, schema_table, i):
+        mgr = CopyManager(conn, schema_table, self.cols[i : i + 1])
+        message = "error formatting values for column {}".format(self.cols[i])
+        for values in [np.array([1000000]), np.array([1.5]), np.array([True])]:
+            with pytest.raises(ValueError, match=message):
+                mgr.copy_arrays([values])
+
+
+class TestCopyArraysText(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["varchar(4)", "text", "bytea", "numeric", "integer[]"]
+    columns = [
+        np.array(["one", "two", "three", "שלום"]),
+        np.array(["a", None, "bcd", "שלום"], dtype=object),
+        np.array([b"\x00\x01", b"", b"xyz", b"\xff"], dtype=object),
+        np.array(
+            [decimal.Decimal("1.5"), None, decimal.Decimal(3), decimal.Decimal(-2)]
+        ),
+        np.array([[1, 2], None, [], [None]], dtype=object),
+    ]
+    expected_rows = [
+        ("one", "a", b"\x00\x01", decimal.Decimal("1.5"), [1, 2]),
+        ("two", None, b"", None, None),
+        ("thre", "bcd", b"xyz", decimal.Decimal("3"), []),
+        ("שלום", "שלום", b"\xff", decimal.Decimal("-2"), [None]),
+    ]
+
+    def test_copy_arrays(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        ids = np.arange(len(self.expected_rows))
+        mgr.copy_arrays([ids] + self.columns, block_size=40)
+        schema, table = schema_table.split(".")
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(self.select_list, schema, table))
+        for expected, found in zip(self.expected_rows, cursor.fetchall()):
+            found = [bytes(v) if isinstance(v, memoryview) else v for v in found]
+            assert list(expected) == found[1:]
+
+
+class TestCopyArraysUUID(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["uuid", "uuid", "uuid"]
+    guids = [uuid.UUID(int=i * 0x1234567890ABCDEF) for i in range(4)]
+    columns = [
+        np.array([str(g) for g in guids]),
+        np.array([g.hex.upper() for g in guids[:3]] + ["{%s}" % guids[3]]),
+        np.array([g.bytes for g in guids]),
+    ]
+    masks = [[False, True, False, False], None, [True, False, False, False]]
+
+    def test_copy_arrays(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        ids = np.arange(len(self.guids))
+        mgr.copy_arrays([ids] + self.columns, [None] + self.masks)
+        schema, table = schema_table.split(".")
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(self.select_list, schema, table))
+        found = [tuple(map(str, row[1:])) for row in cursor.fetchall()]
+        expected = [(str(g),) * 3 for g in self.guids]
+        expected[0] = (str(self.guids[0]), str(self.guids[0]), "None")
+        expected[1] = ("None", str(self.guids[1]), str(self.guids[1]))
+        assert found == expected
+
+    def test_invalid(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols[:2])
+        message = "error formatting values for column {}".format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            mgr.copy_arrays([np.arange(1), np.array(["x" * 36])])
+
+
+class TestCopyArraysErrors(db.TemporaryTable):
+    datatypes = ["smallint", "numeric"]
+
+    def test_notnull(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols[:2])
+        message = 'null value in column "{}" not allowed'.format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            mgr.copy_arrays([np.arange(2), np.ma.masked_equal([1, 2], 2)])
+
+    def test_out_of_range(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols[:2])
+        message = "error formatting values for column {}".format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            mgr.copy_arrays([np.arange(2), np.array([1, 2**20])])
+
+    def test_error_while_streaming(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols[:2])
+        values = np.arange(40000)
+        message = "error formatting values for column {}".format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            mgr.copy_arrays([values, values], block_size=1024)
+
+    def test_unsupported(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        message = "type numeric is not supported for float64 values"
+        with pytest.raises(TypeError, match=message):
+            mgr.copy_arrays([np.arange(2), np.arange(2), np.array([1.5, 2.5])])
@@ -1,10 +1,78 @@
 import json
+import struct
 
 import pgcopy.contrib.vector
+import pytest
+from pgcopy.contrib.vector import (
+    bit_formatter,
+    halfvec_formatter,
+    sparsevec_formatter,
+    vector_formatter,
+)
 
+from . import db
 from .test_datatypes import TypeMixin
 
 
+def packed(formatter, val):
+    fmt, data = formatter(val)
+    return struct.pack(">" + fmt, *data)
+
+
+class SparseVector(object):
+    "as in the pgvector package"
+
+    def __init__(self, elems, dim):
+        self.elems, self.dim = elems, dim
+
+    def dimensions(self):
+        return self.dim
+
+    def indices(self):
+        return list(self.elems)
+
+    def values(self):
+        return list(self.elems.values())
+
+
+def test_halfvec():
+    assert packed(halfvec_formatter, [1.5, -2]) == bytes.fromhex(
+        "00000008" "0002" "0000" "3e00" "c000"
+    )
+
+
+@pytest.mark.parametrize(
+    "val", [[0, 1.5, 0, 0, -2], SparseVector({4: -2, 1: 1.5, 2: 0}, 5)]
+)
+def test_sparsevec(val):
+    expected = struct.pack(">4i2i2f", 28, 5, 2, 0, 1, 4, 1.5, -2)
+    assert packed(sparsevec_formatter, val) == expected
+
+
+@pytest.mark.parametrize("val", ["101000001", [1, 0, 1, 0, 0, 0, 0, 0, 1]])
+def test_bit(val):
+    assert packed(bit_formatter, val) == bytes.fromhex("00000006" "00000009" "a080")
+
+
+def test_ndarray():
+    np = pytest.importorskip("numpy")
+    val = [1.5, -2.25, 3]
+    assert packed(vector_formatter, np.array(val)) == packed(vector_formatter, val)
+    assert packed(halfvec_formatter, np.array(val)) == packed(halfvec_formatter, val)
+    assert packed(sparsevec_formatter, np.array([0, 1.5, 0, 0, -2])) == packed(
+        sparsevec_formatter, [0, 1.5, 0, 0, -2]
+    )
+    bits = np.array([1, 0, 1, 0, 0, 0, 0, 0, 1], dtype=bool)
+    assert packed(bit_formatter, bits) == packed(bit_formatter, "101000001")
+    with pytest.raises(ValueError, match="is not a 1D array type"):
+        vector_formatter(np.ones((2, 2)))
+
+
+def test_not_1d():
+    with pytest.raises(ValueError, match="is not a 1D array type"):
+        vector_formatter([[1.5]])
+
+
 class TestVector(TypeMixin):
     copy_manager_class = pgcopy.contrib.vector.CopyManager
     extensions = ["vector"]
@@ -15,3 +83,55 @@ class TestVector(TypeMixin):
 
     def cast(self, v):
         return tuple(json.loads(v))
+
+
+class TestHalfvec(TestVector):
+    datatypes = ["halfvec"]
+    data = [((-1.5, 0, 2.25),)]
+
+
+class TestSparsevec(TypeMixin):
+    copy_manager_class = pgcopy.contrib.vector.CopyManager
+    extensions = ["vector"]
+    datatypes = ["sparsevec"]
+    data = [([0, 1.5, 0, 0, -2],), (SparseVector({2: 0.5}, 3),)]
+
+    def expected(self, rec):
+        return ["{2:1.5,5:-2}/5"] if isinstance(rec[0], list) else ["{3:0.5}/3"]
+
+
+class TestBit(TypeMixin):
+    copy_manager_class = pgcopy.contrib.vector.CopyManager
+    datatypes = ["bit(9)", "varbit"]
+    data = [("101000001", ""), ([True] * 9, b"\xff\x01")]
+
+    def expected(self, rec):
+        if rec[1] == "":
+            return ["101000001", ""]
+        return ["1" * 9, "1111111100000001"]
+
+
+class TestVectorArrays(db.TemporaryTable):
+    extensions = ["vector"]
+    null = "NULL"
+    datatypes = ["vector(3)"]
+
+    def test_copy_arrays(self, conn, cursor, schema_table):
+        np = pytest.importorskip("numpy")
+        mgr = pgcopy.contrib.vector.CopyManager(conn, schema_table, self.cols)
+        vectors = np.arange(12, dtype="f8").reshape(4, 3) / 4
+        mask = [False, False, True, False]
+        mgr.copy_arrays([np.arange(4), vectors], [None, mask], block_size=32)
+        sql = 'SELECT "{}"::text FROM "{}"."{}" ORDER BY id'
+        cursor.execute(sql.format(self.cols[1], *schema_table.split(".")))
+        found = [row[0] and json.loads(row[0]) for row in cursor.fetchall()]
+        expected = vectors.tolist()
+        expected[2] = None
+        assert found == expected
+
+    def test_not_2d(self, conn, schema_table):
+        np = pytest.importorskip("numpy")
+        mgr = pgcopy.contrib.vector.CopyManager(conn, schema_table, self.cols)
+        message = "error formatting values for column {}".format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            mgr.copy_arrays([np.arange(3), np.arange(3.0)])
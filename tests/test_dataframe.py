@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import pytest
+from pgcopy import CopyManager
+
+from . import db
+
+pd = pytest.importorskip("pandas")
+
+
+class TestCopyDataFrame(db.TemporaryTable):
+    null = "NULL"
+    datatypes = [
+        "bigint",
+        "double precision",
+        "bool",
+        "varchar(12)",
+        "timestamp",
+        "timestamp with time zone",
+    ]
+
+    def dataframe(self):
+        eastern = pd.to_datetime(["2020-06-01 12:00", None, "2021-01-01 00:00"])
+        return pd.DataFrame(
+            {
+                "id": [0, 1, 2],
+                "COL_a": pd.array([1, None, 3], dtype="Int64"),
+                "COL_b": [1.5, float("nan"), -1],
+                "COL_c": pd.array([True, False, None], dtype="boolean"),
+                "COL_d": ["one", None, "three"],
+                "COL_e": pd.to_datetime(["2020-01-01", "2020-01-02", None]),
+                "COL_f": eastern.tz_localize("US/Eastern"),
+            }
+        )
+
+    expected_rows = [
+        (0, 1, 1.5, True, "one", datetime(2020, 1, 1), datetime(2020, 6, 1, 16)),
+        (1, None, None, False, None, datetime(2020, 1, 2), None),
+        (2, 3, -1, None, "three", None, datetime(2021, 1, 1, 5)),
+    ]
+
+    def test_copy_dataframe(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.copy_dataframe(self.dataframe(), rows_per_chunk=2)
+        schema, table = schema_table.split(".")
+        sql = 'SELECT {} FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(self.select_list, schema, table))
+        for expected, found in zip(self.expected_rows, cursor.fetchall()):
+            *found, tstz = found
+            if tstz is not None:
+                tstz = tstz.astimezone(timezone.utc).replace(tzinfo=None)
+            assert list(expected) == found + [tstz]
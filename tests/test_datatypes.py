@@ -277,6 +277,39 @@ class TestNumeric(TypeMixin):
     ]
 
 
+class TestNumericInputs(TypeMixin):
+    datatypes = ["numeric"]
+    data = [
+        (1,),
+        (-2.5,),
+        (0.1,),
+        (1e-05,),
+        (10**30,),
+        (decimal.Decimal("1E-7"),),
+    ]
+
+    def expected(self, rec):
+        return [decimal.Decimal(repr(v)) if isinstance(v, float) else v for v in rec]
+
+
+class TestNumericScale(TypeMixin):
+    datatypes = ["numeric(8, 2)"]
+    scaled = {
+        decimal.Decimal("1.005"): "1.01",
+        -2.5: "-2.50",
+        3: "3.00",
+        decimal.Decimal("-0.125"): "-0.13",
+        decimal.Decimal("1E+3"): "1000.00",
+    }
+    data = [(v,) for v in scaled]
+
+    def expected(self, rec):
+        return [self.scaled[v] for v in rec]
+
+    def cast(self, v):
+        return str(v)
+
+
 class TestNumericNan(TypeMixin):
     datatypes = ["numeric"]
     data = [
@@ -293,13 +326,17 @@ class TestUUID(TypeMixin):
         (uuid.UUID("55daa192-a28a-4c49-ae84-ef3564e32308"),),
         (uuid.UUID("8b56420e-7e15-4bae-a76e-af20e35ea88f"),),
         ("01959495-3659-7870-be82-0974b221a5ea",),
+        ("{0195949536597870be820974b221a5eb}",),
+        (b"\x01\x95\x94\x956Yxp\xbe\x82\tt\xb2!\xa5\xec",),
     ]
 
     def cast(self, v):
+        if isinstance(v, bytes):
+            return uuid.UUID(bytes=v)
         return uuid.UUID(v) if isinstance(v, str) else v
 
     def expected(self, rec):
-        return (self.cast(v) if isinstance(v, str) else v for v in rec)
+        return (self.cast(v) for v in rec)
 
 
 class TestEnum(TypeMixin):
@@ -0,0 +1,242 @@
+import calendar
+import decimal
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+
+import pytest
+import pytz
+from pgcopy import CopyManager, copy, util
+
+from . import db
+
+
+class TestRowEncoder(db.TemporaryTable):
+    id_col = False
+    null = "NULL"
+    datatypes = [
+        "integer",
+        "double precision",
+        "varchar(5)",
+        "numeric",
+        "bool",
+        "integer[]",
+    ]
+    records = [
+        (1, 1.5, "abcdefgh", decimal.Decimal("1.25"), True, [1, 2]),
+        (None, None, None, None, None, None),
+        (2, 2.5, b"xy", None, False, [None]),
+        (3, 3.5, "z"),
+        (4, 4.5, "z", None, None, None, "extra"),
+    ]
+
+    def test_matches_slow_path(self, conn, schema_table):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        for record in self.records:
+            assert encoder.encode(record) == encoder.encode_slow(record)
+
+    def test_encode_into(self, conn, schema_table):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        records = self.records + [(5, 5.5, bytearray(b"xy"), None, None, None)]
+        buf = bytearray(b"head")
+        for record in records:
+            encoder.encode_into(record, buf)
+        assert buf == b"head" + b"".join(map(encoder.encode_slow, records))
+
+    def test_diagnostic(self, conn, schema_table):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        message = "error formatting value 23 for column {}".format(self.cols[2])
+        with pytest.raises(ValueError, match=message):
+            encoder.encode((1, 1.5, 23, None, None, None))
+
+    def test_iterable_records(self, conn, schema_table):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        buf = bytearray()
+        for record in self.records:
+            assert encoder.encode(iter(record)) == encoder.encode_slow(record)
+            encoder.encode_into(iter(record), buf)
+        assert buf == b"".join(map(encoder.encode_slow, self.records))
+
+
+class TestRowEncoderNotNull(db.TemporaryTable):
+    id_col = False
+    datatypes = ["integer", "bool", "text"]
+
+    def test_fixed_width_run(self, conn, schema_table):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        record = (1, False, "one")
+        assert encoder.encode(record) == encoder.encode_slow(record)
+
+    def test_notnull(self, conn, schema_table):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        message = 'null value in column "{}" not allowed'.format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            encoder.encode((1, None, "one"))
+        with pytest.raises(ValueError, match=message):
+            encoder.encode(iter((1, None, "one")))
+
+    def test_iterable_records(self, conn, cursor, schema_table):
+        class Text(str):
+            pass
+
+        mgr = CopyManager(conn, schema_table, self.cols)
+        records = [(1, True, Text("one")), (2, False, "two")]
+        mgr.copy(map(iter, records))
+        sql = 'SELECT * FROM "{}"."{}" ORDER BY 1'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        assert list(map(tuple, cursor.fetchall())) == records
+
+
+eastern = pytz.timezone("US/Eastern")
+datetimes = [
+    datetime(2000, 1, 1),
+    datetime(1, 1, 1),
+    datetime(9999, 12, 31, 23, 59, 59, 999999),
+    datetime(2020, 3, 8, 1, 59, 59, 999999, tzinfo=pytz.UTC),
+    datetime(2020, 3, 8, 12, 30, tzinfo=timezone(timedelta(hours=-5, minutes=-30))),
+    eastern.localize(datetime(2020, 3, 8, 3, 0)),
+    eastern.localize(datetime(2020, 1, 8, 3, 0)),
+    datetime(2020, 6, 1, tzinfo=eastern),
+    datetime(2020, 6, 1, tzinfo=pytz.FixedOffset(90)),
+    date(1999, 12, 31),
+]
+
+
+@pytest.mark.parametrize("dt", datetimes)
+def test_timestamp_value(dt):
+    utc = util.to_utc(dt)
+    expected = (calendar.timegm(utc.timetuple()) - copy.psql_epoch) * 1000000
+    assert copy.timestamp_value(dt) == expected + utc.microsecond
+
+
+def test_time_value():
+    assert copy.time_value(time(23, 59, 59, 1)) == 86399000001
+    assert copy.time_value(datetime(2020, 1, 1, 0, 0, 1)) == 1000000
+    with pytest.raises(ValueError):
+        copy.time_value(time(1, tzinfo=timezone.utc))
+
+
+guid = uuid.UUID("01959495-3659-7870-be82-0974b221a5ea")
+
+
+@pytest.mark.parametrize(
+    "value",
+    [guid, str(guid), guid.hex, str(guid).upper(), guid.urn, guid.bytes],
+)
+def test_uuid_value(value):
+    assert copy.uuid_value(value) == guid.bytes
+
+
+@pytest.mark.parametrize("value", [guid.hex[:-1] + "x", guid.hex[:-2], b"\x01"])
+def test_uuid_value_invalid(value):
+    with pytest.raises(ValueError):
+        copy.uuid_value(value)
+
+
+class TestTemporalEncoder(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["timestamp with time zone", "timestamp", "date", "time"]
+
+    def test_roundtrip(self, conn, cursor, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        records = [(i, dt, dt, dt, time(i)) for i, dt in enumerate(datetimes[3:])]
+        records.append((len(records), None, None, None, None))
+        for record in records:
+            assert mgr.encoder.encode(record) == mgr.encoder.encode_slow(record)
+        mgr.copy(records)
+        sql = """SELECT extract(epoch from "COL_a"), extract(epoch from "COL_b"),
+            "COL_c" - date '2000-01-01', extract(epoch from "COL_d")
+            FROM "{}"."{}" ORDER BY id"""
+        cursor.execute(sql.format(*schema_table.split(".")))
+        for (i, dt, _, _, t), row in zip(records, cursor.fetchall()):
+            if dt is None:
+                assert tuple(row) == (None, None, None, None)
+                continue
+            epoch = util.to_utc(dt).timestamp()
+            assert [float(row[0]), float(row[1])] == [epoch, epoch]
+            assert row[2] == (dt.toordinal() - date(2000, 1, 1).toordinal())
+            assert float(row[3]) == 3600 * i
+
+
+class TestNumericFormatter(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["numeric", "numeric(10, 3)"]
+
+    def test_cache(self, conn, cursor, schema_table):
+        class PriceCopyManager(CopyManager):
+            type_formatters = {"numeric": copy.NumericFormatter(maxsize=16)}
+
+        mgr = PriceCopyManager(conn, schema_table, self.cols)
+        values = [decimal.Decimal("1.0"), decimal.Decimal("1.00"), 1, 1.0] * 3
+        records = [(i, v, v) for i, v in enumerate(values)]
+        for record in records:
+            assert mgr.encoder.encode(record) == CopyManager.from_plan(
+                mgr.plan()
+            ).encoder.encode(record)
+        formatter, scaled = mgr.encoder.base_formatters[1:]
+        assert scaled.scale == 3
+        assert scaled.cache_info()[:2] == (len(values) - 3, 3)
+        assert formatter.cache_info().currsize == 4
+        mgr.copy(records)
+        sql = 'SELECT "COL_a"::text, "COL_b"::text FROM "{}"."{}" ORDER BY id'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        assert [tuple(r) for r in cursor.fetchall()[:4]] == [
+            ("1.0", "1.000"),
+            ("1.00", "1.000"),
+            ("1", "1.000"),
+            ("1.0", "1.000"),
+        ]
+
+
+tenant = "55daa192-a28a-4c49-ae84-ef3564e32308"
+
+
+class TestMemoize(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["varchar(4)", "uuid", "timestamp with time zone", "numeric", "int"]
+    records = [
+        (i, status, tenant, datetime(2020, 1, 1 + i % 2), amount, i)
+        for i, (status, amount) in enumerate(
+            [
+                ("new", decimal.Decimal("1.0")),
+                ("done", decimal.Decimal("1.00")),
+                ("new", 1),
+                ("shipped", None),
+                (None, [1]),
+                ("done", decimal.Decimal("1.0")),
+            ]
+        )
+    ]
+
+    def manager(self, conn, schema_table):
+        class MemoCopyManager(CopyManager):
+            memoize = {col: 4 for col in self.cols}
+
+        return MemoCopyManager(conn, schema_table, self.cols)
+
+    def test_encode(self, conn, schema_table):
+        encoder = self.manager(conn, schema_table).encoder
+        plain = CopyManager(conn, schema_table, self.cols).encoder
+        for record in self.records[:4] + self.records[5:]:
+            assert encoder.encode(record) == plain.encode(record)
+        with pytest.raises(ValueError, match="error formatting value"):
+            # unhashable
+            encoder.encode(self.records[4])
+
+    def test_stats(self, conn, cursor, schema_table):
+        mgr = self.manager(conn, schema_table)
+        records = self.records[:4] + self.records[5:]
+        mgr.copy(records)
+        stats = mgr.memo_stats()
+        assert set(stats) == set(self.cols[1:5])
+        assert stats["COL_a"][1:3] == (2, 3)
+        assert stats["COL_b"][:4] == (0.8, 4, 1, 4)
+        assert stats["COL_c"].currsize == 2
+        sql = 'SELECT "COL_a", "COL_d"::text FROM "{}"."{}" ORDER BY id'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        assert [tuple(r) for r in cursor.fetchall()] == [
+            ("new", "1.0"),
+            ("done", "1.00"),
+            ("new", "1"),
+            ("ship", None),
+            ("done", "1.0"),
+        ]
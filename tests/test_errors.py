@@ -20,6 +20,16 @@ class TestErrors(db.TemporaryTable):
         with pytest.raises(ValueError, match=message):
             bincopy.copy([[None]])
 
+    def test_notnull_streamed(self, conn, cursor, schema_table):
+        bincopy = CopyManager(conn, schema_table, self.cols)
+        data = [[i, i] for i in range(1000)] + [[1000, None]]
+        message = 'null value in column "{}" not allowed'.format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            bincopy.copy(data, block_size=100)
+        conn.rollback()
+        cursor.execute("SELECT 1")
+        assert list(cursor.fetchone()) == [1]
+
 
 class TestFormatterDiagnostic(db.TemporaryTable):
     id_col = False
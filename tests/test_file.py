@@ -0,0 +1,37 @@
+import json
+
+import pytest
+from pgcopy import CopyManager
+
+from . import db
+
+
+class TestCopyFile(db.TemporaryTable):
+    datatypes = ["integer", "varchar(12)", "timestamp with time zone", "integer[]"]
+    data = [(i, db.genstr12(i), db.gendatetimetz(i), [i, None]) for i in range(100)]
+
+    def test_plan(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        plan = json.loads(json.dumps(mgr.plan()))
+        offline = CopyManager.from_plan(plan)
+        assert offline.backend is None
+        assert offline.encoder.atts == mgr.encoder.atts
+        assert offline.encoder.encoding == mgr.encoder.encoding
+
+    def test_write_load(self, conn, cursor, schema_table, data, tmp_path):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        offline = CopyManager.from_plan(json.loads(json.dumps(mgr.plan())))
+        path = tmp_path / "data.pgcopy"
+        size = offline.write_file(data, str(path), block_size=100)
+        assert size == path.stat().st_size
+        assert mgr.load_file(str(path), read_size=1000) == size
+        sql = 'SELECT count(*), sum("id") FROM "{}"."{}"'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        assert tuple(cursor.fetchone()) == (100, sum(range(100)))
+
+    def test_not_copy_file(self, conn, schema_table, tmp_path):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        path = tmp_path / "data.csv"
+        path.write_bytes(b"1,2,3\n")
+        with pytest.raises(ValueError, match="not a binary copy file"):
+            mgr.load_file(str(path))
@@ -0,0 +1,46 @@
+import pytest
+from pgcopy import CopyManager, inspect
+
+from . import db
+
+
+class TestInspectMany(db.TemporaryTable):
+    datatypes = ["integer", "varchar(12)", "bool"]
+    null = ""
+    record_count = 10
+
+    def test_get_types_many(self, conn, schema_table):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        tables = [
+            tuple(schema_table.split(".")),
+            ("pg_catalog", "pg_namespace"),
+            ("public", "missing"),
+        ]
+        types = inspect.get_types_many(mgr.backend, tables)
+        assert list(types) == tables
+        assert types[tables[0]] == inspect.get_types(mgr.backend, *tables[0])
+        assert types[tables[1]]["oid"].type_name == "oid"
+        assert types[tables[2]] == {}
+
+    def test_for_tables(self, conn, cursor, schema_table, data):
+        table = schema_table.split(".")[1]
+        managers = CopyManager.for_tables(
+            conn, {schema_table: self.cols, table: self.cols[:2]}
+        )
+        mgr = managers[schema_table]
+        assert managers[table].schema == mgr.schema
+        assert [att.type_name for att in mgr.encoder.atts] == [
+            "int4",
+            "int4",
+            "varchar",
+            "bool",
+        ]
+        managers[table].copy([r[:2] for r in data])
+        mgr.copy(data)
+        sql = 'SELECT count(*) FROM "{}"."{}"'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        assert cursor.fetchone()[0] == 2 * len(data)
+
+    def test_for_tables_missing_column(self, conn, schema_table):
+        with pytest.raises(ValueError, match="missing"):
+            CopyManager.for_tables(conn, {schema_table: ["id", "missing"]})
@@ -0,0 +1,120 @@
+import array
+import hashlib
+import io
+
+import pytest
+from pgcopy import CopyManager, buffers
+from pgcopy.copy import BINCOPY_HEADER, DeferringBuffer
+
+from . import db
+
+
+class SmallValueCopyManager(CopyManager):
+    large_value_size = 16
+
+
+class TestLargeValues(db.TemporaryTable):
+    null = "NULL"
+    datatypes = ["bytea", "text", "integer"]
+    data = [
+        (b"x" * 100, "y" * 100, 1),
+        (memoryview(b"abc" * 20), "short", 2),
+        (bytearray(b"z" * 30), "ש" * 20, 3),
+        (array.array("i", range(10)), None, 4),
+        (io.BytesIO(b"file" * 10), "t", 5),
+        (b"tiny", "t" * 16, 6),
+        (io.BytesIO(b"s"), None, 7),
+    ]
+
+    def expected(self):
+        values = [b"x" * 100, b"abc" * 20, b"z" * 30, array.array("i", range(10))]
+        values += [b"file" * 10, b"tiny", b"s"]
+        return [hashlib.md5(bytes(v)).hexdigest() for v in values]
+
+    def check(self, cursor, schema_table):
+        sql = 'SELECT md5("COL_a"), "COL_b" FROM "{}"."{}" ORDER BY id'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        rows = [tuple(r) for r in cursor.fetchall()]
+        assert [r[0] for r in rows] == self.expected()
+        assert [r[1] for r in rows] == [r[1] for r in self.data]
+
+    def records(self):
+        for i, (a, b, c) in enumerate(self.data):
+            if isinstance(a, io.BytesIO):
+                a.seek(0)
+            yield (i, a, b, c)
+
+    @pytest.mark.parametrize("block_size", [10, 1 << 20])
+    def test_copy(self, conn, cursor, schema_table, block_size):
+        mgr = SmallValueCopyManager(conn, schema_table, self.cols)
+        mgr.copy(self.records(), block_size=block_size)
+        self.check(cursor, schema_table)
+
+    def test_writestream(self, conn, cursor, schema_table):
+        mgr = SmallValueCopyManager(conn, schema_table, self.cols)
+        mgr.copy(self.records(), buffers.TemporaryFile())
+        self.check(cursor, schema_table)
+
+    def test_threading_copy(self, conn, cursor, schema_table):
+        mgr = SmallValueCopyManager(conn, schema_table, self.cols)
+        mgr.threading_copy(self.records(), block_size=50)
+        self.check(cursor, schema_table)
+
+    def test_encode_deferred(self, conn, schema_table):
+        encoder = SmallValueCopyManager(conn, schema_table, self.cols).encoder
+        records = list(self.records())
+        # the text value is not str or bytes, so the record is encoded
+        # again by the slow path, without the deferred value
+        records.append((7, b"a" * 20, bytearray(b"b" * 20), 8))
+        expected = bytearray(BINCOPY_HEADER)
+        for record in records:
+            if isinstance(record[1], io.BytesIO):
+                record[1].seek(0)
+            encoder.encode_into(record, expected)
+        buf = DeferringBuffer(BINCOPY_HEADER, 16)
+        for record in self.records():
+            encoder.encode_deferred(record, buf)
+        encoder.encode_deferred(records[-1], buf)
+        assert len(buf.deferred) == 8
+        stream = io.BytesIO()
+        assert buf.write_to(stream) == len(expected)
+        assert stream.getvalue() == expected
+        assert not buf and not buf.deferred
+
+    def test_file_fallback(self, conn, cursor, schema_table):
+        class Text(str):
+            pass
+
+        # the text value is not exactly str, so the file value is read
+        # again by the slow path
+        encoder = SmallValueCopyManager(conn, schema_table, self.cols).encoder
+        record = (0, io.BytesIO(b"hello"), Text("x"), 1)
+        expected = encoder.encode((0, b"hello", "x", 1))
+        assert encoder.encode(record) == expected
+        buf = bytearray()
+        encoder.encode_into(record, buf)
+        assert buf == expected
+        buf = DeferringBuffer(b"", 16)
+        encoder.encode_deferred(record, buf)
+        assert buf == expected
+        mgr = SmallValueCopyManager(conn, schema_table, self.cols)
+        mgr.copy([(0, io.BytesIO(b"hello" * 10), Text("x"), 1)])
+        sql = 'SELECT "COL_a", "COL_b" FROM "{}"."{}"'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        value, text = cursor.fetchone()
+        assert (bytes(value), text) == (b"hello" * 10, "x")
+
+    def test_file_error(self, conn, cursor, schema_table):
+        class BrokenFile(io.BytesIO):
+            def read(self, size=-1):
+                if self.tell():
+                    raise OSError("broken file")
+                return super().read(min(size, 10))
+
+        mgr = SmallValueCopyManager(conn, schema_table, self.cols)
+        records = [(0, b"x" * 100, "y", 1), (1, BrokenFile(b"z" * 100), "y", 2)]
+        with pytest.raises(Exception):
+            mgr.copy(records, block_size=50)
+        conn.rollback()
+        cursor.execute("SELECT 1")
+        assert cursor.fetchone()[0] == 1
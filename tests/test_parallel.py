@@ -0,0 +1,65 @@
+import contextlib
+
+import pytest
+from pgcopy import ParallelCopyManager
+from pgcopy.errors import CopyAborted
+
+from . import db, db_connection
+
+
+class TestParallelCopy(db.TemporaryTable):
+    tempschema = False
+    datatypes = ["integer", "varchar(12)"]
+    record_count = 100
+
+    @pytest.fixture
+    def manager(self, adaptor, conn):
+        conn.commit()
+        connect = lambda: type(adaptor)(db_connection.connection_params, "UTF8").conn
+        mgr = ParallelCopyManager(connect, "public." + self.table, self.cols, 3)
+        yield mgr
+        mgr.close()
+        with contextlib.closing(conn.cursor()) as cur:
+            cur.execute(self.drop_sql())
+        conn.commit()
+
+    def count(self, conn):
+        with contextlib.closing(conn.cursor()) as cur:
+            cur.execute('SELECT count(*), sum("id") FROM "public"."%s"' % self.table)
+            return tuple(cur.fetchone())
+
+    def test_round_robin(self, conn, manager, data):
+        stats = manager.copy(data, rows_per_chunk=15)
+        assert [s.rows for s in stats] == [40, 30, 30]
+        assert all(s.bytes > 0 for s in stats)
+        assert self.count(conn) == (100, sum(range(100)))
+
+    def test_key(self, conn, manager, data):
+        stats = manager.copy(data, key=lambda r: r[0] % 3, rows_per_chunk=10)
+        assert sorted(s.rows for s in stats) == [33, 33, 34]
+        assert self.count(conn) == (100, sum(range(100)))
+
+    def test_abort(self, conn, manager, data):
+        def records():
+            yield from data[:50]
+            raise ZeroDivisionError()
+
+        with pytest.raises(ZeroDivisionError):
+            manager.copy(records(), rows_per_chunk=10, block_size=64)
+        manager.commit()
+        assert self.count(conn) == (0, None)
+
+    def test_worker_error(self, conn, manager, data):
+        read = []
+
+        def records():
+            for i in range(10**6):
+                read.append(i)
+                yield (i, "x" if i == 25 else 0, "y")
+
+        with pytest.raises(Exception) as excinfo:
+            manager.copy(records(), rows_per_chunk=10, block_size=64)
+        assert not isinstance(excinfo.value, CopyAborted)
+        assert len(read) < 10**6
+        manager.commit()
+        assert self.count(conn) == (0, None)
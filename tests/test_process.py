@@ -0,0 +1,35 @@
+import decimal
+import pickle
+
+import pytest
+from pgcopy import CopyManager
+
+from . import db
+
+
+class TestMultiprocessingCopy(db.TemporaryTable):
+    datatypes = ["numeric", "varchar(12)", "timestamp with time zone"]
+    data = [
+        (decimal.Decimal(i) / 8, db.genstr12(i), db.gendatetimetz(i)) for i in range(50)
+    ]
+
+    def test_pickle(self, conn, schema_table, data):
+        encoder = CopyManager(conn, schema_table, self.cols).encoder
+        unpickled = pickle.loads(pickle.dumps(encoder))
+        for record in data:
+            assert unpickled.encode(record) == encoder.encode(record)
+
+    def test_multiprocessing_copy(self, conn, cursor, schema_table, data):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        mgr.multiprocessing_copy(data, processes=2, rows_per_chunk=7, max_pending=2)
+        schema, table = schema_table.split(".")
+        sql = 'SELECT count(*), sum("{}") FROM "{}"."{}"'
+        cursor.execute(sql.format(self.cols[1], schema, table))
+        assert tuple(cursor.fetchone()) == (len(data), sum(row[1] for row in data))
+
+    def test_error(self, conn, schema_table, data):
+        mgr = CopyManager(conn, schema_table, self.cols)
+        data[20] = (20, "twenty", b"", None)
+        message = "error formatting value twenty for column {}".format(self.cols[1])
+        with pytest.raises(ValueError, match=message):
+            mgr.multiprocessing_copy(data, processes=2, rows_per_chunk=7)
@@ -2,6 +2,7 @@ import os
 from io import BytesIO
 
 from pgcopy import CopyManager
+from pgcopy.copy import EncodingReader
 
 from . import db
 
@@ -26,6 +27,22 @@ class TestSanity(db.TemporaryTable):
         datastream.seek(0)
         assert self.expected_output == datastream.read()
 
+    def test_block_size(self, conn, schema_table, data):
+        mgr = self.manager(conn, schema_table, self.cols)
+        datastream = WriteCounter()
+        mgr.writestream(data, datastream, block_size=100)
+        assert datastream.writes == 2
+        datastream.seek(0)
+        assert self.expected_output == datastream.read()
+
+    def test_encoding_reader(self, conn, schema_table, data):
+        mgr = self.manager(conn, schema_table, self.cols)
+        reader = EncodingReader(mgr.encoder, data)
+        chunks = list(iter(lambda: reader.read(7), b""))
+        assert all(len(chunk) == 7 for chunk in chunks[:-1])
+        assert self.expected_output == b"".join(chunks)
+        assert reader.size == len(self.expected_output)
+
     expected_output = (
         b"PGCOPY\n\xff\r\n\x00\x00\x00\x00\x00"
         b"\x00\x00\x00\x00\x00\x05\x00\x00\x00\x04\x00\x00\x00\x00\x00"
@@ -41,3 +58,11 @@ class TestSanity(db.TemporaryTable):
         b"\nc81e728d9d\x00\x00\x00\x01"
         b"\x00\xff\xff"
     )
+
+
+class WriteCounter(BytesIO):
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
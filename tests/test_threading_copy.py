@@ -19,12 +19,12 @@ class TestThreadingCopy(test_datatypes.TypeMixin):
         cursor.execute(self.select_sql(schema_table))
         self.checkResults(cursor, data)
 
-    def test_threading_copy_error(self, conn, cursor):
+    def test_threading_copy_error(self, conn, cursor, copy_data_error):
         data = [{}]
         mgr = CopyManager(conn, self.table, self.cols)
         if not mgr.implements_threading_copy:
             pytest.skip("threading_copy not implemented")
-        with pytest.raises(conn.DataError):
+        with pytest.raises(copy_data_error):
             mgr.threading_copy(data)
 
     def test_threading_copy_generator(self, conn, cursor, schema_table, data):
@@ -45,3 +45,35 @@ class TestThreadingCopy(test_datatypes.TypeMixin):
         select_list = ",".join(self.cols)
         cursor.execute(self.select_sql(schema_table))
         self.checkResults(cursor, data)
+
+    def test_threading_copy_blocks(self, conn, cursor, schema_table):
+        data = [(i, i) for i in range(1000)]
+        mgr = CopyManager(conn, self.table, self.cols)
+        mgr.threading_copy(data, block_size=100)
+        cursor.execute(self.select_sql(schema_table))
+        self.checkResults(cursor, data)
+
+    def test_threading_copy_server_error(
+        self, conn, cursor, schema_table, copy_integrity_error
+    ):
+        data = [(i % 500, i) for i in range(1000)]
+        sql = 'CREATE UNIQUE INDEX ON "{}"."{}" ("id")'
+        cursor.execute(sql.format(*schema_table.split(".")))
+        mgr = CopyManager(conn, self.table, self.cols)
+        if not mgr.implements_threading_copy:
+            pytest.skip("threading_copy not implemented")
+        with pytest.raises(copy_integrity_error):
+            mgr.threading_copy(data, block_size=100)
+
+    def test_threading_copy_abort(self, conn, cursor):
+        def data():
+            yield from ((i, i) for i in range(1000))
+            raise ZeroDivisionError()
+
+        mgr = CopyManager(conn, self.table, self.cols)
+        with pytest.raises(ZeroDivisionError):
+            mgr.threading_copy(data(), block_size=100)
+        # the connection is still usable
+        conn.rollback()
+        cursor.execute("SELECT 1")
+        assert list(cursor.fetchone()) == [1]